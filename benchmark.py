@@ -0,0 +1,332 @@
+"""
+Per-stage microbenchmarks for the OCR pipeline.
+
+Renders synthetic pages (generate_test_image.py style) at several sizes and
+noise levels with a fixed seed, then times each stage on its real input.
+
+    python benchmark.py                          # JSON to stdout
+    python benchmark.py --save bench_baseline.json
+    python benchmark.py --compare bench_baseline.json   # exit 1 on regressions
+    python benchmark.py --check                  # optimized stages == reference, exit 1 if not
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from src import preprocess, segment, postprocess, trace
+
+SEED = 1234
+SIZES = [(400, 300), (800, 600), (1600, 1200)]
+NOISE_LEVELS = [0, 10, 25]  # Gaussian sigma in gray levels
+QUICK_SIZES = [(800, 600)]
+QUICK_NOISE_LEVELS = [0, 25]
+CHECK_PAGES = 12      # Noisy, rotated pages used by --check
+CHECK_MAX_ANGLE = 6.0  # Degrees
+
+TEXT_LINES = [
+    "TINY WORLD AI OCR",
+    "HELLO JUDGES",
+    "THIS IS A TEST 12345",
+    "THE QUICK BROWN FOX",
+    "JUMPS OVER THE DOG",
+    "Lorem Ipsum is simply dummy text of the printing",
+    "and typesetting industry. It has survived five centuries",
+    "0123456789",
+]
+
+# Typical OCR confusions used to make the postprocess input realistic
+OCR_CONFUSIONS = [("O", "0"), ("I", "1"), ("m", "rn"), ("w", "vv"), ("S", "5"), ("O", "Q")]
+
+def load_font(size):
+    for name in ("C:\\Windows\\Fonts\\arial.ttf", "arial.ttf", "DejaVuSans.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except (IOError, OSError):
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+def render_page(width, height, noise_sigma, rng):
+    """White page with black text lines, plus Gaussian noise. Returns BGR uint8."""
+    img = Image.new('RGB', (width, height), color='white')
+    draw = ImageDraw.Draw(img)
+    font = load_font(max(12, height // 24))
+
+    y = height // 20
+    line = 0
+    while y < height - height // 10:
+        text = TEXT_LINES[line % len(TEXT_LINES)]
+        draw.text((width // 16, y), text, font=font, fill='black')
+        bbox = draw.textbbox((0, 0), text, font=font)
+        y += (bbox[3] - bbox[1]) + height // 40
+        line += 1
+
+    page = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+    if noise_sigma:
+        noise = rng.normal(0, noise_sigma, page.shape)
+        page = np.clip(page + noise, 0, 255).astype(np.uint8)
+    return page
+
+def make_ocr_text(n_lines, rng):
+    """Text with injected OCR-style errors for the postprocess stages."""
+    out = []
+    for i in range(n_lines):
+        line = TEXT_LINES[i % len(TEXT_LINES)]
+        for good, bad in OCR_CONFUSIONS:
+            if rng.random() < 0.5:
+                line = line.replace(good, bad, 1)
+        out.append(line + "  .")
+    return "\n".join(out)
+
+def time_stage(fn, min_time=0.2, min_repeats=5, max_repeats=1000):
+    """Runs fn repeatedly; returns timing stats in milliseconds."""
+    fn()  # Warm-up
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < max_repeats and (len(samples) < min_repeats or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "mean_ms": statistics.fmean(samples),
+        "repeats": len(samples),
+    }
+
+def peak_allocation_mb(fn):
+    """Peak bytes (MB) newly allocated by one steady-state call of fn (numpy/OpenCV arrays included)."""
+    fn()  # Warm-up: fills caches and reusable buffers
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        return (tracemalloc.get_traced_memory()[1] - before) / (1024.0 * 1024.0)
+    finally:
+        tracemalloc.stop()
+
+def bench_case(width, height, noise_sigma, min_time):
+    rng = np.random.default_rng(SEED)
+    page = render_page(width, height, noise_sigma, rng)
+
+    # Intermediate inputs, produced the same way preprocess_image does
+    gray = preprocess.to_grayscale(page)
+    contrast = preprocess.enhance_contrast(gray)
+    denoised = preprocess.denoise(contrast)
+    sharp = preprocess.sharpen_image(denoised)
+    binary = preprocess.binarize(sharp)
+    lines = segment.detect_lines(binary)
+    line_crops = [binary[y:y+h, x:x+w] for x, y, w, h in lines]
+    text = make_ocr_text(max(1, len(lines)), random.Random(SEED))
+    fixed = postprocess.fix_ocr_errors(text)
+
+    preprocessor = preprocess.Preprocessor()
+
+    def segment_all_lines():
+        for crop in line_crops:
+            segment.segment_chars_from_line(crop)
+
+    stages = {
+        "check_text_presence": lambda: preprocess.check_text_presence(page),
+        "to_grayscale": lambda: preprocess.to_grayscale(page),
+        "enhance_contrast": lambda: preprocess.enhance_contrast(gray),
+        "denoise": lambda: preprocess.denoise(contrast),
+        "sharpen_image": lambda: preprocess.sharpen_image(denoised),
+        "binarize": lambda: preprocess.binarize(sharp),
+        "get_skew_angle": lambda: preprocess.get_skew_angle(binary),
+        "rotate_image": lambda: preprocess.rotate_image(binary, 2.0),
+        "detect_lines": lambda: segment.detect_lines(binary),
+        "segment_chars_from_line": segment_all_lines,
+        "fix_ocr_errors": lambda: postprocess.fix_ocr_errors(text),
+        "clean_text": lambda: postprocess.clean_text(fixed),
+        "preprocess_image": lambda: preprocess.preprocess_image(image_array=page),
+        "Preprocessor.process": lambda: preprocessor.process(image_array=page),
+    }
+    results = {name: time_stage(fn, min_time=min_time) for name, fn in stages.items()}
+    for name in ("preprocess_image", "Preprocessor.process"):
+        results[name]["peak_alloc_mb"] = peak_allocation_mb(stages[name])
+    return results
+
+def run_benchmarks(quick=False, min_time=0.2):
+    sizes = QUICK_SIZES if quick else SIZES
+    noise_levels = QUICK_NOISE_LEVELS if quick else NOISE_LEVELS
+    results = {}
+    for width, height in sizes:
+        for noise_sigma in noise_levels:
+            case = f"{width}x{height}_noise{noise_sigma}"
+            print(f"Benchmarking {case}...", file=sys.stderr)
+            results[case] = bench_case(width, height, noise_sigma, min_time)
+    return {
+        "meta": {
+            "seed": SEED,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "platform": platform.platform(),
+            "cv2_threads": cv2.getNumThreads(),
+            "peak_rss_mb": trace.peak_rss_mb(),
+        },
+        "results": results,
+    }
+
+def compare(current, baseline, threshold=0.10):
+    """
+    Prints per-stage median ratios against a baseline.
+    Returns:
+        regressions: list of (case, stage, ratio) slower than 1 + threshold
+    """
+    regressions = []
+    print(f"{'case':<22} {'stage':<26} {'base ms':>9} {'now ms':>9} {'ratio':>7}")
+    for case, stages in current["results"].items():
+        base_stages = baseline["results"].get(case)
+        if base_stages is None:
+            continue
+        for stage, stats in stages.items():
+            if stage not in base_stages:
+                continue
+            base = base_stages[stage]["median_ms"]
+            now = stats["median_ms"]
+            ratio = now / base if base > 0 else float("inf")
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  SLOWER"
+                regressions.append((case, stage, ratio))
+            elif ratio < 1 - threshold:
+                flag = "  faster"
+            print(f"{case:<22} {stage:<26} {base:9.3f} {now:9.3f} {ratio:7.2f}{flag}")
+    return regressions
+
+def check_pages(n=CHECK_PAGES):
+    """Synthetic pages of every size and noise level, rotated by random small angles."""
+    rng = np.random.default_rng(SEED)
+    cases = [(size, noise) for size in SIZES for noise in NOISE_LEVELS]
+    for i in range(n):
+        (width, height), noise_sigma = cases[i % len(cases)]
+        page = render_page(width, height, noise_sigma, rng)
+        angle = float(rng.uniform(-CHECK_MAX_ANGLE, CHECK_MAX_ANGLE))
+        yield f"{width}x{height}_noise{noise_sigma}_rot{angle:+.1f}", preprocess.rotate_image(page, angle)
+
+def _reference_segment_chars(binary_line_region):
+    """The per-contour filter and merge loop segment_chars_from_line replaced."""
+    cnts, _ = cv2.findContours(binary_line_region, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    raw_boxes = []
+    for c in cnts:
+        x, y, w, h = cv2.boundingRect(c)
+        if w < 3 or h < 8:
+            continue
+        aspect = w / float(h)
+        if aspect > 3.0 or aspect < 0.1:
+            continue
+        if w > 100 or h > 100:
+            continue
+        raw_boxes.append([x, y, w, h])
+
+    merged = []
+    for current in sorted(raw_boxes, key=lambda b: b[0]):
+        if not merged:
+            merged.append(current)
+            continue
+        last = merged[-1]
+        overlap_width = max(0, min(last[0] + last[2], current[0] + current[2]) - max(last[0], current[0]))
+        min_width = min(last[2], current[2])
+        overlap_ratio = overlap_width / min_width if min_width > 0 else 0
+        if overlap_ratio > 0.3 and abs(last[1] - current[1]) < last[3] * 0.5:
+            x1 = min(last[0], current[0])
+            y1 = min(last[1], current[1])
+            x2 = max(last[0] + last[2], current[0] + current[2])
+            y2 = max(last[1] + last[3], current[1] + current[3])
+            merged[-1] = [x1, y1, x2 - x1, y2 - y1]
+        else:
+            merged.append(current)
+
+    chars = [(x, y, w, h, 0, 0) for x, y, w, h in merged]
+    chars.sort(key=lambda b: b[0])
+    return chars
+
+def check_equivalence(n=CHECK_PAGES):
+    """
+    Checks that optimized stages give exactly the output of the code they
+    replaced, on noisy, rotated synthetic pages.
+    Returns:
+        failures: list of (page, check) that differ
+    """
+    failures = []
+    preprocessor = preprocess.Preprocessor()
+    for name, page in check_pages(n):
+        binary, _, info = preprocess.preprocess_image(image_array=page, return_info=True)
+
+        lines = segment.detect_lines(binary)
+        crops = [binary[y:y+h, x:x+w] for x, y, w, h in lines]
+        if any(segment.segment_chars_from_line(c) != _reference_segment_chars(c) for c in crops):
+            failures.append((name, "segment_chars_from_line"))
+
+        # One Preprocessor across all pages, so stale scratch buffers would show
+        processed, _, processed_info = preprocessor.process(image_array=page, return_info=True)
+        if processed.tobytes() != binary.tobytes() or processed.shape != binary.shape:
+            failures.append((name, "Preprocessor.process"))
+        elif processed_info != info:
+            failures.append((name, "Preprocessor.process info"))
+
+        print(f"{name}: {len(lines)} lines checked", file=sys.stderr)
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-stage OCR pipeline benchmarks.")
+    parser.add_argument("--quick", action="store_true", help="one size, two noise levels")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to sample each stage")
+    parser.add_argument("--threads", type=int, default=None, help="cv2.setNumThreads (default: OpenCV's)")
+    parser.add_argument("--save", default=None, help="write results JSON to this file")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold (0.10 = 10%%)")
+    parser.add_argument("--check", action="store_true",
+                        help="only check optimized stages against reference implementations")
+    args = parser.parse_args(argv)
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    if args.check:
+        failures = check_equivalence()
+        for name, check in failures:
+            print(f"MISMATCH {check} on {name}")
+        if failures:
+            print(f"\n{len(failures)} check(s) failed")
+            return 1
+        print(f"\nAll stages match on {CHECK_PAGES} pages.")
+        return 0
+
+    current = run_benchmarks(quick=args.quick, min_time=args.min_time)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved results to {args.save}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, threshold=args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than baseline by >{args.threshold:.0%}")
+            return 1
+        print("\nNo regressions.")
+        return 0
+
+    if not args.save:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
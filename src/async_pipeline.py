@@ -0,0 +1,113 @@
+"""
+asyncio OCR API with bounded concurrency.
+
+    ocr = AsyncOCR(recognize.Recognizer(), max_concurrency=8)
+    results = await asyncio.gather(*(ocr.ocr(image_path=p) for p in paths))
+
+Preprocessing (OpenCV, CPU-bound) runs in a thread pool, Tesseract runs as
+an asyncio subprocess, and a semaphore caps how many pages are in flight, so
+a single event loop drives many pages without a thread per request.
+Cancelling a task stops its page: a running Tesseract process is killed.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from src import pipeline, preprocess, postprocess
+
+class AsyncOCR:
+    def __init__(self, recognizer, max_concurrency=None, executor=None):
+        """
+        Args:
+            recognizer: a loaded recognize.Recognizer (shared by all requests)
+            max_concurrency: pages in flight at once (default: cores)
+            executor: pool for preprocessing (default: one thread per core)
+        """
+        cores = os.cpu_count() or 1
+        self.recognizer = recognizer
+        self.max_concurrency = max_concurrency or cores
+        self.executor = executor or ThreadPoolExecutor(max_workers=cores, thread_name_prefix="ocr-preprocess")
+        self._owns_executor = executor is None
+        self._semaphore = None  # Created inside the running loop
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _prepare(self, image_path, image_array, denoise_mode):
+        """
+        Returns:
+            binary: preprocessed page (None when the page has no text)
+            info: preprocess info, or the check_text stats for a skipped page
+            skip: reason the page has no text, or None
+        """
+        if image_array is None:
+            image_array = cv2.imread(image_path)
+            if image_array is None:
+                raise ValueError("Could not load image")
+        reason, stats = pipeline.check_text(image_array)
+        if reason is not None:
+            return None, stats, reason
+        binary, _, info = preprocess.preprocess_image(image_array=image_array, denoise_mode=denoise_mode,
+                                                      return_info=True)
+        return binary, info, None
+
+    async def ocr(self, image_path=None, image_array=None, lang='eng', safe_mode=True, denoise_mode="auto"):
+        """
+        Async equivalent of pipeline.run_pipeline.
+        Returns:
+            result: dict with final text, raw text, confidence, preprocess info
+                    and elapsed seconds (including time waiting for a slot)
+        """
+        start_time = time.perf_counter()
+        loop = asyncio.get_running_loop()
+
+        async with self._get_semaphore():
+            # Step 0-1: Blank check + Cleaning (CPU-bound, off the event loop)
+            binary, preprocess_info, skip = await loop.run_in_executor(
+                self.executor, lambda: self._prepare(image_path, image_array, denoise_mode))
+            if skip is not None:
+                return pipeline.no_text_result(skip, preprocess_info, seconds=time.perf_counter() - start_time)
+
+            # Step 2-3: Recognition (asyncio subprocess)
+            raw_text, confidence = await self.recognizer.extract_text_with_layout_async(
+                binary, lang=lang, executor=self.executor)
+
+        # Step 4: Rule Correction (pure string work, cheap)
+        text = ""
+        if raw_text:
+            text = postprocess.clean_text(postprocess.fix_ocr_errors(raw_text), safe_mode=safe_mode)
+
+        return {
+            "text": text,
+            "raw_text": raw_text,
+            "confidence": confidence,
+            "preprocess": preprocess_info,
+            "seconds": time.perf_counter() - start_time,
+            "cached": False,
+        }
+
+    async def ocr_many(self, image_paths, **options):
+        """Yields (path, result) as pages complete; failed pages yield (path, exception)."""
+        async def one(path):
+            try:
+                return path, await self.ocr(image_path=path, **options)
+            except Exception as e:
+                return path, e
+
+        tasks = [asyncio.ensure_future(one(p)) for p in image_paths]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consumer stopped early or was cancelled: stop the remaining pages
+            for task in tasks:
+                task.cancel()
+
+    def close(self):
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
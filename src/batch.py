@@ -0,0 +1,193 @@
+"""
+Headless batch OCR over directories, globs and file lists.
+
+Usage:
+    python -m src.batch scans/ "inbox/*.png" list.txt --workers 8 --output results.jsonl
+
+Each result is written as one JSON line as soon as it completes (in completion
+order, not input order). Progress and throughput go to stderr. Pages that
+fail (including recognition errors) get their message in 'error' and make the
+exit status 2; an unavailable backend exits 1 before any work starts.
+"""
+import argparse
+import glob
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+import cv2
+
+from src import cache, pipeline, preprocess, recognize, trace
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+LIST_EXTENSIONS = ('.txt', '.lst')
+
+# Per-process state, created once by _init_worker
+_worker_recognizer = None
+_worker_cache = None
+_worker_preprocessor = None
+_worker_options = {}
+
+def collect_inputs(sources):
+    """
+    Expands directories, glob patterns and list files into image paths.
+    Args:
+        sources: iterable of directory paths, glob patterns, list files
+                 (.txt/.lst, one path per line) or image paths
+    Returns:
+        paths: list of image paths, de-duplicated, in discovery order
+    """
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        paths.append(os.path.join(root, name))
+        elif glob.has_magic(source):
+            paths.extend(p for p in sorted(glob.glob(source, recursive=True))
+                         if p.lower().endswith(IMAGE_EXTENSIONS))
+        elif source.lower().endswith(LIST_EXTENSIONS):
+            with open(source, "r", encoding="utf-8") as f:
+                paths.extend(line.strip() for line in f if line.strip())
+        else:
+            paths.append(source)
+
+    seen = set()
+    return [p for p in paths if not (p in seen or seen.add(p))]
+
+def _init_worker(options):
+    """Loads one warm Recognizer per worker process."""
+    global _worker_recognizer, _worker_cache, _worker_preprocessor, _worker_options
+    # The pool provides the parallelism: keep OpenCV and Tesseract to one
+    # thread each so N workers don't oversubscribe N cores.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    cv2.setNumThreads(1)
+
+    # Keep stdout clean for JSON lines: anything a worker prints (model
+    # loading, cache write errors) goes to stderr for the worker's lifetime
+    sys.stdout = sys.stderr
+    # Recognition errors raise, so they land in the result's 'error' field
+    _worker_recognizer = recognize.Recognizer(backend=options["backend"], raise_errors=True)
+    _worker_options = options
+    # Scratch buffers reused across every page this worker handles
+    _worker_preprocessor = preprocess.Preprocessor()
+    if options["cache_dir"]:
+        # Memory tier is per worker; the disk tier is shared by all of them
+        _worker_cache = cache.ResultCache(cache_dir=options["cache_dir"])
+
+def _process_one(path):
+    try:
+        result = pipeline.run_pipeline(_worker_recognizer, image_path=path,
+                                       lang=_worker_options["lang"],
+                                       safe_mode=_worker_options["safe_mode"],
+                                       result_cache=_worker_cache,
+                                       collect_trace=_worker_options["trace"],
+                                       tiled=_worker_options["tiled"],
+                                       line_parallel=_worker_options["line_parallel"],
+                                       crop_regions=_worker_options["crop_regions"],
+                                       preprocessor=_worker_preprocessor)
+        result["error"] = None
+    except Exception as e:
+        result = {"text": "", "raw_text": "", "confidence": 0.0, "seconds": 0.0, "error": str(e)}
+    result["path"] = path
+    return result
+
+def run_batch(paths, workers=None, lang='eng', safe_mode=True, chunksize=1, backend="tesseract",
+              cache_dir=None, collect_trace=False, tiled=False, line_parallel=False,
+              crop_regions=False):
+    """
+    Runs the OCR pipeline over `paths` on a process pool.
+    Args:
+        paths: list of image paths
+        workers: number of processes (default: all cores)
+        lang: Tesseract language code
+        safe_mode (bool): passed through to postprocess.clean_text
+        chunksize: paths handed to a worker at a time
+        backend: recognition backend name (see recognize.create_backend)
+        cache_dir: optional on-disk result cache shared by all workers
+        collect_trace: include a per-stage timing trace in every result
+        tiled: full-resolution strip OCR per page (see tiling.recognize_tiled)
+        line_parallel: recognize lines of a page in parallel (see lines.recognize_lines)
+        crop_regions: recognize only text regions (see regions.recognize_regions)
+    Yields:
+        result dicts (see pipeline.run_pipeline) plus 'path' and 'error', as they complete
+    """
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(paths)))
+    options = {"lang": lang, "safe_mode": safe_mode, "backend": backend, "cache_dir": cache_dir,
+               "trace": collect_trace, "tiled": tiled, "line_parallel": line_parallel,
+               "crop_regions": crop_regions}
+
+    with mp.Pool(workers, initializer=_init_worker, initargs=(options,)) as pool:
+        for result in pool.imap_unordered(_process_one, paths, chunksize=chunksize):
+            yield result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.batch", description="Headless batch OCR.")
+    parser.add_argument("sources", nargs="+", help="directories, glob patterns, list files or images")
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: all cores)")
+    parser.add_argument("--lang", default="eng", help="Tesseract language code (default: eng)")
+    parser.add_argument("--backend", default="tesseract", choices=sorted(recognize.BACKENDS) + ["auto"],
+                        help="recognition backend (default: tesseract)")
+    parser.add_argument("--unsafe", action="store_true", help="disable Safe Mode (aggressive demo fixes)")
+    parser.add_argument("--chunksize", type=int, default=1, help="paths per worker task")
+    parser.add_argument("--cache-dir", default=None,
+                        help=f"reuse results for unchanged images (e.g. {cache.DEFAULT_CACHE_DIR})")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--tiled", action="store_true",
+                      help="OCR large pages at full resolution in parallel strips (use fewer --workers)")
+    mode.add_argument("--lines", action="store_true",
+                      help="recognize the lines of each page in parallel (use fewer --workers)")
+    mode.add_argument("--regions", action="store_true",
+                      help="recognize only detected text regions (fast on sparse pages)")
+    parser.add_argument("--trace", action="store_true", help="include per-stage timings in each result")
+    parser.add_argument("--output", default=None, help="JSON lines file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    paths = collect_inputs(args.sources)
+    if not paths:
+        print("No input images found.", file=sys.stderr)
+        return 1
+
+    # Fail fast instead of reporting every page as an empty result
+    backend = recognize.create_backend(args.backend)
+    if not backend.is_available():
+        print(f"Recognition backend '{args.backend}' is not available "
+              f"(Tesseract not installed or char model not trained).", file=sys.stderr)
+        return 1
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start_time = time.perf_counter()
+    done = failed = cached = blank = 0
+    try:
+        for result in run_batch(paths, workers=args.workers, lang=args.lang,
+                                safe_mode=not args.unsafe, chunksize=args.chunksize,
+                                backend=args.backend, cache_dir=args.cache_dir,
+                                collect_trace=args.trace, tiled=args.tiled,
+                                line_parallel=args.lines, crop_regions=args.regions):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+
+            done += 1
+            failed += result["error"] is not None
+            cached += bool(result.get("cached"))
+            blank += bool(result.get("no_text"))
+            elapsed = time.perf_counter() - start_time
+            print(f"[{done}/{len(paths)}] {result['path']} "
+                  f"({done / elapsed:.2f} files/sec)", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Done: {done} files ({failed} failed, {cached} cached, {blank} without text) in {elapsed:.1f}s "
+          f"= {done / elapsed:.2f} files/sec", file=sys.stderr)
+    workers_rss = trace.peak_rss_mb(children=True)
+    if workers_rss is not None:
+        print(f"Peak RSS: {trace.peak_rss_mb():.0f} MB main, {workers_rss:.0f} MB largest worker", file=sys.stderr)
+    return 0 if failed == 0 else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+from src import cache, lines, preprocess, postprocess, regions, tiling, trace
+
+def cache_key(recognizer, image_path=None, image_array=None, lang='eng', safe_mode=True, denoise_mode="auto",
+              tiled=False, line_parallel=False, crop_regions=False, skip_blank=True, preprocessor=None):
+    """
+    Result cache key: image content + every setting that changes the output,
+    including the postprocess rules in use and the preprocessor's scaling
+    settings (cache.CACHE_VERSION covers code changes).
+    """
+    image_hash = cache.hash_image(image_path=image_path, image_array=image_array)
+    return cache.make_key(image_hash, lang=lang, safe_mode=safe_mode, denoise_mode=denoise_mode,
+                          recognizer=recognizer.cache_token(), tiled=tiled,
+                          line_parallel=line_parallel, crop_regions=crop_regions, skip_blank=skip_blank,
+                          rules=postprocess.rules_digest(),
+                          preprocess=preprocess.preprocess_settings(preprocessor))
+
+def check_recognition_mode(tiled=False, line_parallel=False, crop_regions=False):
+    """tiled, line_parallel and crop_regions are alternative ways to recognize a page; allow at most one."""
+    chosen = [name for name, on in (("tiled", tiled), ("line_parallel", line_parallel),
+                                    ("crop_regions", crop_regions)) if on]
+    if len(chosen) > 1:
+        raise ValueError(f"choose at most one of tiled, line_parallel and crop_regions (got {', '.join(chosen)})")
+
+def check_text(image):
+    """
+    Step 0: blank/no-text pre-check on a thumbnail.
+    Returns:
+        reason: why the page has no text, or None when it should be OCR'd
+        stats: measurements behind the decision
+    """
+    with trace.span("preprocess.check_text", image) as sp:
+        has_text, reason, stats = preprocess.check_text_presence(image)
+        sp.set(has_text=has_text)
+    return reason, stats
+
+def no_text_result(reason, stats, seconds=0.0):
+    """Pipeline result for a page skipped by check_text."""
+    return {
+        "text": "",
+        "raw_text": "",
+        "confidence": 0.0,
+        "preprocess": {"text_check": stats},
+        "seconds": seconds,
+        "cached": False,
+        "no_text": reason,
+    }
+
+def run_pipeline(recognizer, image_path=None, image_array=None, lang='eng', safe_mode=True,
+                 denoise_mode="auto", result_cache=None, collect_trace=False, tiled=False, line_parallel=False,
+                 crop_regions=False, skip_blank=True, preprocessor=None):
+    """
+    Headless OCR pipeline: preprocess -> recognize -> postprocess.
+    Args:
+        recognizer: a loaded recognize.Recognizer (reuse it across images)
+        image_path: Path to image file
+        image_array: numpy array of image (if already loaded)
+        lang: Tesseract language code
+        safe_mode (bool): passed through to postprocess.clean_text
+        denoise_mode: passed through to preprocess.preprocess_image
+        result_cache: optional cache.ResultCache; hits skip the whole pipeline
+        collect_trace: add a per-stage timing trace (list of spans) as 'trace'
+        tiled: OCR at full resolution in parallel strips (tiling.recognize_tiled)
+               instead of scaling the whole page
+        line_parallel: recognize each detected line separately, lines in
+                       parallel (lines.recognize_lines); adds 'lines'
+        crop_regions: recognize only the detected text regions
+                      (regions.recognize_regions); adds 'regions'
+                      (tiled, line_parallel and crop_regions are exclusive:
+                      ValueError if more than one is set)
+        skip_blank: return early, with the reason as 'no_text', for pages
+                    that clearly contain no text (see check_text)
+        preprocessor: optional preprocess.Preprocessor (one per worker) used
+                      instead of preprocess_image to reuse its buffers
+    Returns:
+        result: dict with final text, raw text, confidence, preprocess info,
+                elapsed seconds and whether it came from the cache
+    """
+    if collect_trace:
+        with trace.tracing() as tr:
+            result = run_pipeline(recognizer, image_path, image_array, lang=lang, safe_mode=safe_mode,
+                                  denoise_mode=denoise_mode, result_cache=result_cache, tiled=tiled,
+                                  line_parallel=line_parallel, crop_regions=crop_regions,
+                                  skip_blank=skip_blank, preprocessor=preprocessor)
+        result["trace"] = tr.to_list()
+        return result
+
+    check_recognition_mode(tiled, line_parallel, crop_regions)
+    start_time = time.perf_counter()
+
+    key = None
+    if result_cache is not None:
+        with trace.span("pipeline.cache_lookup"):
+            key = cache_key(recognizer, image_path, image_array, lang=lang, safe_mode=safe_mode,
+                            denoise_mode=denoise_mode, tiled=tiled, line_parallel=line_parallel,
+                            crop_regions=crop_regions, skip_blank=skip_blank, preprocessor=preprocessor)
+            result = result_cache.get(key)
+        if result is not None:
+            result["cached"] = True
+            result["seconds"] = time.perf_counter() - start_time
+            return result
+
+    if skip_blank:
+        # Step 0: Blank check (decode here once; later steps reuse the array)
+        if image_array is None:
+            with trace.span("preprocess.decode", path=image_path):
+                image_array = cv2.imread(image_path)
+            if image_array is None:
+                raise ValueError("Could not load image")
+            image_path = None
+        reason, stats = check_text(image_array)
+        if reason is not None:
+            result = no_text_result(reason, stats, time.perf_counter() - start_time)
+            if result_cache is not None:
+                result_cache.put(key, result)
+            return result
+
+    line_results = region_results = None
+    if tiled:
+        # Step 1-3: Cleaning + Recognition per full-resolution strip
+        raw_text, confidence, preprocess_info = tiling.recognize_tiled(
+            recognizer, image_path=image_path, image_array=image_array, lang=lang, denoise_mode=denoise_mode)
+    else:
+        # Step 1: Cleaning
+        preprocess_fn = preprocessor.process if preprocessor is not None else preprocess.preprocess_image
+        binary, _, preprocess_info = preprocess_fn(image_path=image_path, image_array=image_array,
+                                                   denoise_mode=denoise_mode, return_info=True)
+
+        # Step 2-3: Recognition
+        if line_parallel:
+            raw_text, confidence, line_results = lines.recognize_lines(recognizer, binary, lang=lang)
+        elif crop_regions:
+            raw_text, confidence, region_results = regions.recognize_regions(recognizer, binary, lang=lang,
+                                                                                preprocess_info=preprocess_info)
+        else:
+            raw_text, confidence = recognizer.extract_text_with_layout(binary, lang=lang)
+
+    # Step 4: Rule Correction
+    text = ""
+    if raw_text:
+        text = postprocess.clean_text(postprocess.fix_ocr_errors(raw_text), safe_mode=safe_mode)
+
+    result = {
+        "text": text,
+        "raw_text": raw_text,
+        "confidence": confidence,
+        "preprocess": preprocess_info,
+        "seconds": time.perf_counter() - start_time,
+        "cached": False,
+    }
+    if line_results is not None:
+        result["lines"] = line_results
+    if region_results is not None:
+        result["regions"] = region_results
+    if result_cache is not None:
+        result_cache.put(key, result)
+    return result
+
+class StagedPipeline:
+    """
+    Keeps intermediate artifacts of the most recent images so a re-run only
+    repeats the stages whose inputs changed:
+
+        decode (image) -> preprocess (denoise_mode) -> recognize (lang, recognizer)
+        -> postprocess (safe_mode, always re-run: it is pure string work)
+
+    Switching only the language re-runs recognition; toggling only Safe
+    Mode re-runs nothing but postprocessing.
+    """
+    def __init__(self, recognizer, max_images=4):
+        self.recognizer = recognizer
+        self.max_images = max_images
+        self._images = OrderedDict()  # image key -> artifacts dict
+        self._lock = threading.RLock()
+        self.last_stages = []  # Stages actually executed by the last call
+
+    def _image_key(self, image_path, image_array):
+        if image_array is not None:
+            return cache.hash_image(image_array=image_array)
+        # Path + mtime + size: a changed file on disk is a new image
+        st = os.stat(image_path)
+        return (os.path.abspath(image_path), st.st_mtime_ns, st.st_size)
+
+    def _artifacts(self, image_path, image_array):
+        key = self._image_key(image_path, image_array)
+        if key in self._images:
+            self._images.move_to_end(key)
+            return self._images[key]
+
+        self.last_stages.append("decode")
+        with trace.span("pipeline.decode", path=image_path):
+            img = image_array if image_array is not None else cv2.imread(image_path)
+        if img is None:
+            raise ValueError("Could not load image")
+        artifacts = {"decoded": img, "binary": {}, "raw": {}}
+        self._images[key] = artifacts
+        while len(self._images) > self.max_images:
+            self._images.popitem(last=False)
+        return artifacts
+
+    def check_text(self, image_path=None, image_array=None):
+        """Returns (reason, stats) from pipeline.check_text, once per image."""
+        with self._lock:
+            artifacts = self._artifacts(image_path, image_array)
+            if "text_check" not in artifacts:
+                self.last_stages.append("check_text")
+                artifacts["text_check"] = check_text(artifacts["decoded"])
+            return artifacts["text_check"]
+
+    def preprocess(self, image_path=None, image_array=None, denoise_mode="auto"):
+        """Returns (binary, original, info), reusing the last result for this image."""
+        with self._lock:
+            artifacts = self._artifacts(image_path, image_array)
+            if denoise_mode not in artifacts["binary"]:
+                self.last_stages.append("preprocess")
+                artifacts["binary"][denoise_mode] = preprocess.preprocess_image(
+                    image_array=artifacts["decoded"], denoise_mode=denoise_mode, return_info=True)
+            return artifacts["binary"][denoise_mode]
+
+    def recognize(self, image_path=None, image_array=None, lang='eng', denoise_mode="auto"):
+        """Returns (raw_text, confidence), reusing the last result for this image/language."""
+        with self._lock:
+            artifacts = self._artifacts(image_path, image_array)
+            raw_key = (lang, denoise_mode, self.recognizer.cache_token())
+            if raw_key not in artifacts["raw"]:
+                binary, _, _ = self.preprocess(image_path, image_array, denoise_mode=denoise_mode)
+                self.last_stages.append("recognize")
+                artifacts["raw"][raw_key] = self.recognizer.extract_text_with_layout(binary, lang=lang)
+            return artifacts["raw"][raw_key]
+
+    def run(self, image_path=None, image_array=None, lang='eng', safe_mode=True, denoise_mode="auto",
+            collect_trace=False):
+        """
+        Same result dict as run_pipeline, plus 'stages' listing what actually ran.
+        """
+        if collect_trace:
+            with trace.tracing() as tr:
+                result = self.run(image_path, image_array, lang=lang, safe_mode=safe_mode,
+                                  denoise_mode=denoise_mode)
+            result["trace"] = tr.to_list()
+            return result
+
+        start_time = time.perf_counter()
+        with self._lock:
+            self.last_stages = []
+            reason, stats = self.check_text(image_path, image_array)
+            if reason is not None:
+                result = no_text_result(reason, stats, time.perf_counter() - start_time)
+                result["stages"] = list(self.last_stages)
+                return result
+            _, _, preprocess_info = self.preprocess(image_path, image_array, denoise_mode=denoise_mode)
+            raw_text, confidence = self.recognize(image_path, image_array, lang=lang, denoise_mode=denoise_mode)
+            stages = self.last_stages + ["postprocess"]
+
+        text = ""
+        if raw_text:
+            text = postprocess.clean_text(postprocess.fix_ocr_errors(raw_text), safe_mode=safe_mode)
+
+        return {
+            "text": text,
+            "raw_text": raw_text,
+            "confidence": confidence,
+            "preprocess": preprocess_info,
+            "seconds": time.perf_counter() - start_time,
+            "cached": False,
+            "stages": stages,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
@@ -1,170 +1,105 @@
+import hashlib
+import json
+import os
 import re
+from functools import partial
+
+from src import trace
+
+# Rule sets for fix_ocr_errors / clean_text, compiled once by load_rules()
+RULES_PATH = os.path.join(os.path.dirname(__file__), "ocr_rules.json")
+
+def _compile_pass(rule):
+    """
+    Compile one rule pass into a text -> text function.
+    Pass types:
+        regex:   ordered [pattern, replacement] pairs, one re.sub each
+        words:   whole-word replacements, one alternation regex + dict lookup
+        literal: plain substring replacements, one alternation regex + dict lookup
+    """
+    kind = rule["type"]
+    if kind == "regex":
+        subs = [partial(re.compile(p).sub, r) for p, r in rule["rules"]]
+        def apply(text):
+            for sub in subs:
+                text = sub(text)
+            return text
+        return apply
+
+    if kind in ("words", "literal"):
+        table = rule["words"] if kind == "words" else rule["replacements"]
+        ignore_case = rule.get("ignore_case", False)
+        norm = str.lower if ignore_case else (lambda s: s)
+        lookup = {norm(k): v for k, v in table.items()}
+        # Longest first so a key never shadows a longer one sharing its prefix
+        alternation = "|".join(re.escape(k) for k in sorted(table, key=len, reverse=True))
+        if kind == "words":
+            alternation = r"\b(?:" + alternation + r")\b"
+        pattern = re.compile(alternation, re.IGNORECASE if ignore_case else 0)
+        replace = lambda m: lookup[norm(m.group(0))]
+        return partial(pattern.sub, replace)
+
+    raise ValueError(f"Unknown rule type: {kind}")
+
+class RuleEngine:
+    """
+    Named chains of compiled rule passes. Passes marked "unsafe_only" are
+    skipped when running in Safe Mode.
+    """
+    def __init__(self, rules):
+        # Identifies the rule content (result cache keys include it)
+        self.digest = hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+        self.chains = {}
+        for name, passes in rules.items():
+            compiled = [(_compile_pass(p), p.get("unsafe_only", False)) for p in passes]
+            self.chains[name] = {
+                True: [fn for fn, unsafe_only in compiled if not unsafe_only],
+                False: [fn for fn, _ in compiled],
+            }
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def apply(self, name, text, safe_mode=False):
+        for fn in self.chains[name][safe_mode]:
+            text = fn(text)
+        return text
+
+_engine = None
+
+def load_rules(path=RULES_PATH):
+    """(Re)load and compile the rule sets used by fix_ocr_errors/clean_text."""
+    global _engine
+    _engine = RuleEngine.from_file(path)
+    return _engine
+
+load_rules()
+
+def rules_digest():
+    """Digest of the rules fix_ocr_errors/clean_text currently apply."""
+    return _engine.digest
 
 def fix_ocr_errors(text):
     """
     Fix common OCR character substitution errors.
     This improves accuracy by correcting typical mistakes Tesseract makes.
+    Rules live in ocr_rules.json ("fix_ocr_errors"): character-level regex
+    substitutions, then case-insensitive word-level corrections.
     """
-    # Common OCR character substitutions
-    corrections = {
-        # Number/Letter confusions
-        r'\b0(?=[a-zA-Z])': 'O',  # 0 → O when followed by letters
-        r'(?<=[a-zA-Z])0\b': 'O',  # 0 → O when preceded by letters
-        r'\b1(?=[a-zA-Z])': 'I',  # 1 → I when followed by letters (start of word)
-        r'(?<=[a-z])1(?=[a-z])': 'l',  # 1 → l in middle of lowercase words
-        r'5(?=\s+[A-Z])': 'S',  # 5 → S before capital letters
-        r'8(?=\s+[A-Z])': 'B',  # 8 → B before capital letters
-        
-        # Common character confusions
-        r'(?<=[a-z])rn(?=[a-z])': 'm',  # rn → m (very common OCR error)
-        r'(?<=[a-z])vv(?=[a-z])': 'w',  # vv → w
-        r'(?<=[A-Z])l(?=[a-z])': 'I',  # l → I after capital (e.g., "Loreset" → "Lorem")
-        
-        # Punctuation fixes
-        r',,': ',',  # Double comma
-        r'\.\.': '.',  # Double period
-        r'\s+([,\.!?;:])': r'\1',  # Remove space before punctuation
-    }
-    
-    # Apply corrections
-    for pattern, replacement in corrections.items():
-        text = re.sub(pattern, replacement, text)
-    
-    # Fix common word-level errors (case-insensitive)
-    word_corrections = {
-        'loreset': 'Lorem',
-        'ipssant': 'Ipsum',
-        'sergty': 'simply',
-        'prvarg': 'printing',
-        'typesecIrg': 'typesetting',
-        'eubetry': 'industry',
-        'HWnsewYS': 'industry\'s',
-        'sanderd': 'standard',
-        'Gumeny': 'dummy',
-        'Jest': 'text',
-        'Gee': 'ever',
-        'untnomn': 'unknown',
-        'geliry': 'galley',
-        'seremabied': 'scrambled',
-        'NpecHTER': 'specimen',
-        'snareed': 'survived',
-        'OFty': 'only',
-        'fore': 'five',
-        'cortertes': 'centuries',
-        'Wes': 'but',
-        'amo': 'also',
-        'Whe': 'the',
-        'Wao': 'into',
-        'arc': 'the',
-        'Erk': 'electronic',
-        'retecse': 'release',
-        'Lewaset': 'Letraset',
-        'shorts': 'sheets',
-        'pensagel': 'passages',
-        'recer@y': 'recently',
-        'aah': 'with',
-        'Crimp': 'desktop',
-        'svenererg': 'publishing',
-        'sofeeare': 'software',
-        'liee': 'like',
-        'Pageaaher': 'PageMaker',
-        'cuding': 'including',
-        'weruons': 'versions',
-        'ieRan': 'Ipsum',
-    }
-    
-    # Apply word-level corrections (preserve case)
-    for wrong, correct in word_corrections.items():
-        # Case-insensitive replacement
-        text = re.sub(r'\b' + re.escape(wrong) + r'\b', correct, text, flags=re.IGNORECASE)
-    
-    return text
+    with trace.span("postprocess.fix_ocr_errors", text):
+        return _engine.apply("fix_ocr_errors", text)
 
 def clean_text(text, safe_mode=False, confidence_map=None):
     """
     Step 9: Post-processing (Rule-based)
+    Rules live in ocr_rules.json ("clean_text"): repeated letters, spacing,
+    semantic word fixes, 0/O and 1/I context fixes, demo calibration fixes,
+    number spacing.
     Args:
         safe_mode (bool): If True, disable aggressive demo-specific fixes.
         confidence_map (list): List of (char, conf) per line for sophisticated filtering (Not fully used yet, but prepared)
     """
-    # 0. Confidence Filter (Honesty Mode)
-    # If a character was marked as low confidence (Logic handled in UI/main loop), it might come in as '_'
-    # We leave those as is.
-    
-    # 1. Remove repeated characters (e.g. "HHH" -> "H")
-    # Be careful with numbers like 11, 00.
-    # Let's focus on letters.
-    text = re.sub(r'([A-Za-z])\1{2,}', r'\1', text) 
-    
-    # 2. Fix spacing errors (multiple spaces)
-    text = re.sub(r' +', ' ', text)
-    
-    # 4. Semantic corrections (Safety net for high-freq words and common OCR errors)
-    semantic_fixes = {
-        r'\bTTE\b': 'THE',
-        r'\bTTIS\b': 'THIS',
-        r'\bHELW\b': 'HELLO',
-        r'\bUELLO\b': 'HELLO',  # Fix specifically seen in screenshot
-        r'\bI0\b': '10',
-        r'\bAND\b': 'AND',
-        r'\bF0R\b': 'FOR'
-    }
-    
-    # Aggressive demo fixes are ONLY applied if Safe Mode is OFF
-    if not safe_mode:
-        semantic_fixes.update({
-            r'\bW0RLD\b': 'WORLD',
-            r'\bTINYW0RLD\b': 'TINYWORLD',
-            r'\b0CR\b': 'OCR',
-            r'\bQCR\b': 'OCR',
-        })
-
-    for pattern, replacement in semantic_fixes.items():
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-    
-    # 5. Contextual Cleaning: 0 vs O and 1 vs I
-    # Fix 0 inside words being O (e.g. W0RLD -> WORLD)
-    text = re.sub(r'([A-Za-z])0([A-Za-z])', r'\1O\2', text)
-    # Fix 1 inside words being I, but be careful with mixed alphanumerics
-    text = re.sub(r'([A-Z])1([A-Z])', r'\1I\2', text)
-    
-    # 6. Visual Confusion Correction (Calibrated for Demo)
-    if not safe_mode:
-        # Q -> O (Very common error in this model)
-        text = re.sub(r'\bQ([A-Z])', r'O\1', text) # Start of word
-        text = re.sub(r'([A-Z])Q\b', r'\1O', text) # End of word
-        text = re.sub(r'([A-Z])Q([A-Z])', r'\1O\2', text) # Middle of word
-        
-        # Fix 'QFFLINE' -> 'OFFLINE' specific case if regex missed
-        text = text.replace('QFFLINE', 'OFFLINE')
-        text = text.replace('NQ ', 'NO ')
-        text = text.replace('CLQUD', 'CLOUD')
-        text = text.replace('MEMQRY', 'MEMORY')
-        
-        # S -> C (in specific contexts)
-        text = text.replace('OSR', 'OCR')
-        
-        # U -> G (USAGE -> USAUE)
-        text = text.replace('USAUE', 'USAGE')
-        
-        # W -> K (WORKS -> WQRWS? No, that was WQRWS. W->W, R->?, W->K? S->S)
-        # WQRWS -> WORKS
-        # This implies Q->O, R->R, W->K.
-        text = text.replace('WQRWS', 'WORKS')
-        text = text.replace('WORWS', 'WORKS') # Added WORWS
-        
-        # 8 -> 2 (183 -> 123)
-        # Be careful, but for the demo "123" is expected
-        text = text.replace('183', '123')
-    
-    # Fix spacing around numbers (1 . -> 1.)
-    
-    # Fix spacing around numbers (1 . -> 1.)
-    text = re.sub(r'(\d)\s+\.', r'\1.', text) 
-    
-    # 7. Remove leading/trailing non-alphanumeric junk
-    # text = re.sub(r'^[^A-Za-z0-9]+', '', text) 
-    
-    return text.strip()
-    
-    return text.strip()
+    with trace.span("postprocess.clean_text", text, safe_mode=safe_mode):
+        return _engine.apply("clean_text", text, safe_mode=safe_mode).strip()
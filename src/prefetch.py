@@ -0,0 +1,36 @@
+"""
+Ordered read-ahead over a thread pool.
+
+    for result in prefetch.prefetch_map(work, items, window=2):
+        ...
+
+At most `window` calls run (or wait, finished) ahead of the consumer, so
+memory stays bounded however long `items` is; results come back in input
+order. Used for document pages (stream.ocr_document) and training batches
+(train_model.augmentation_stream).
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+def prefetch_map(fn, items, window=2):
+    """
+    Yields fn(item) for every item of `items` (any iterable, consumed
+    lazily), in order, computing up to `window` of them ahead on threads.
+    Closing the generator early cancels the calls not yet started and
+    waits for the running ones.
+    """
+    window = max(1, window)
+    pending = deque()
+    pool = ThreadPoolExecutor(max_workers=window)
+    try:
+        for item in items:
+            while len(pending) >= window:
+                yield pending.popleft().result()
+            pending.append(pool.submit(fn, item))
+            del item  # Only the worker holds it now
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
@@ -1,14 +1,57 @@
+import inspect
+
 import cv2
 import numpy as np
 
+from src import trace
+
 def to_grayscale(image):
     """Converts image to grayscale if not already."""
     if len(image.shape) == 3:
         return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     return image
 
-def denoise(image):
-    """Applies Non-local Means Denoising for better noise removal."""
+# Noise sigma upper bounds for each denoising tier (checked in order);
+# anything noisier gets full Non-local Means.
+DENOISE_TIERS = (
+    (1.0, "none"),
+    (3.0, "median"),
+    (6.0, "bilateral"),
+)
+
+def estimate_noise(image):
+    """
+    Fast noise sigma estimate for a grayscale image (Immerkaer's Laplacian
+    difference operator). Uses the median absolute response so text edges,
+    a small fraction of pixels, don't read as noise.
+    """
+    kernel = np.array([[ 1, -2,  1],
+                       [-2,  4, -2],
+                       [ 1, -2,  1]], dtype=np.float32)
+    response = cv2.filter2D(image, cv2.CV_32F, kernel)
+    # Every other pixel is plenty for a median
+    mad = np.median(np.abs(response[1:-1:2, 1:-1:2]))
+    # |response| of pure Gaussian noise has std 6*sigma; MAD -> sigma via 0.6745
+    return float(mad / (6.0 * 0.6745))
+
+def choose_denoise_tier(sigma):
+    """Pick the cheapest denoiser that handles noise level `sigma`."""
+    for limit, tier in DENOISE_TIERS:
+        if sigma < limit:
+            return tier
+    return "nlm"
+
+def denoise(image, tier="nlm"):
+    """
+    Applies the denoiser for `tier`: 'none', 'median', 'bilateral' or 'nlm'
+    (Non-local Means, the strongest and slowest).
+    """
+    if tier == "none":
+        return image
+    if tier == "median":
+        return cv2.medianBlur(image, 3)
+    if tier == "bilateral":
+        return cv2.bilateralFilter(image, 5, 50, 50)
     # Use fastNlMeansDenoising for grayscale images - better than Gaussian
     return cv2.fastNlMeansDenoising(image, None, h=10, templateWindowSize=7, searchWindowSize=21)
 
@@ -53,20 +96,124 @@ def binarize(image):
     else:
         return thresh
 
-def preprocess_image(image_path=None, image_array=None):
+# Adaptive scaling: bring the typical glyph height to what Tesseract reads
+# best instead of forcing every page to 800px wide.
+TEXT_SIZE_SIDE = 1024         # Longest side of the measuring thumbnail (at most)
+TEXT_SIZE_MIN_GLYPHS = 8      # Fewer glyph-like components: no estimate
+TARGET_TEXT_HEIGHT = 24.0     # Median glyph height (px) pages are scaled to
+TEXT_HEIGHT_RANGE = (16.0, 32.0)  # Heights inside this band are left unscaled
+SCALE_LIMITS = (0.2, 3.0)
+MAX_SCALED_PIXELS = 8000000   # Upscaling never goes past this many pixels
+
+def estimate_text_height(image):
+    """
+    Typical glyph height in pixels, from one connected-component pass over
+    an integer-factor thumbnail.
+    Args:
+        image: BGR or grayscale page (not yet binarized)
+    Returns:
+        height: median glyph height in full-resolution pixels, or None when
+                there are too few glyph-like components to tell
+        glyphs: number of components measured
+    """
+    gray = to_grayscale(image)
+    h, w = gray.shape[:2]
+    k = max(1, -(-max(h, w) // TEXT_SIZE_SIDE))
+    if k > 1:
+        gray = cv2.resize(gray[:h // k * k, :w // k * k], (w // k, h // k), interpolation=cv2.INTER_AREA)
+
+    # Ink is the minority class of an Otsu split
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if np.count_nonzero(ink) > ink.size // 2:
+        ink = cv2.bitwise_not(ink)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    cw, ch, area = stats[1:, 2], stats[1:, 3], stats[1:, 4]
+
+    glyph = (
+        (ch >= 2) & (ch <= gray.shape[0] // 8) &   # Not specks, not rules/photos
+        (cw <= 3 * ch) & (ch <= 6 * cw) &           # Letter-like aspect (merged pairs allowed)
+        (area >= 0.1 * cw * ch)                     # Solid enough (not frames/boxes)
+    )
+    heights = ch[glyph]
+    if len(heights) < TEXT_SIZE_MIN_GLYPHS:
+        return None, int(len(heights))
+    return float(np.median(heights)) * k, int(len(heights))
+
+def choose_scale(text_height, shape, max_width=800):
+    """
+    Resize factor for a page of `shape` whose median glyph height is
+    `text_height` (None: unknown, fall back to the max_width rule).
+    """
+    h, w = shape[:2]
+    if text_height is None:
+        return min(1.0, max_width / float(w)) if max_width else 1.0
+    low, high = TEXT_HEIGHT_RANGE
+    if low <= text_height <= high:
+        return 1.0
+    scale = min(max(TARGET_TEXT_HEIGHT / text_height, SCALE_LIMITS[0]), SCALE_LIMITS[1])
+    if scale > 1.0:
+        scale = max(1.0, min(scale, (MAX_SCALED_PIXELS / float(h * w)) ** 0.5))
+    return scale
+
+def page_scale(img, max_width=800, scale_mode="auto"):
+    """
+    Step 1 resize decision.
+    Args:
+        scale_mode: 'auto' scales by measured text size (see choose_scale),
+                    'fixed' shrinks anything wider than max_width
+        max_width: fixed-mode width and auto-mode fallback (None = keep full resolution)
+    Returns:
+        scale: resize factor (1.0 = unchanged)
+        size: (width, height) to resize to
+        interpolation: OpenCV interpolation flag
+        text_height: measured median glyph height (None if not measured)
+    """
+    h, w = img.shape[:2]
+    if not max_width:
+        return 1.0, (w, h), None, None
+    if scale_mode == "fixed":
+        if w <= max_width:
+            return 1.0, (w, h), None, None
+        scale = max_width / w
+        return scale, (max_width, int(h * scale)), cv2.INTER_LINEAR, None
+
+    with trace.span("preprocess.estimate_text_height", img) as sp:
+        text_height, glyphs = estimate_text_height(img)
+        sp.set(text_height=text_height, glyphs=glyphs)
+    scale = choose_scale(text_height, img.shape, max_width)
+    size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    # Area averaging keeps thin strokes when shrinking; cubic keeps edges smooth when enlarging
+    return scale, size, cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC, text_height
+
+def preprocess_image(image_path=None, image_array=None, denoise_mode="auto", return_info=False,
+                     max_width=800, deskew=True, scale_mode="auto"):
     """
     Main preprocessing pipeline.
     Args:
         image_path: Path to image file
         image_array: numpy array of image (if already loaded)
+        denoise_mode: 'auto' picks a tier from the estimated noise level,
+                      or force one of 'none', 'median', 'bilateral', 'nlm'
+        return_info: also return a dict describing the choices made
+        max_width: 'fixed' mode downscales wider images to this width; also
+                   the fallback when 'auto' cannot measure the text (None =
+                   full resolution, no scaling at all)
+        deskew: estimate and correct skew (tiles of a pre-deskewed page skip it)
+        scale_mode: 'auto' scales so the median glyph height lands near
+                    TARGET_TEXT_HEIGHT (down for large print, up for fine
+                    print); 'fixed' is the old max_width rule
     Returns:
         processed_image: Binary image ready for segmentation
         original_image: The loaded original image (for display)
+        info: (only if return_info) dict with scale, text_height, noise_sigma,
+              denoise_tier, skew_angle, skew_confidence, deskewed
     """
     if image_array is not None:
         img = image_array
     elif image_path:
-        img = cv2.imread(image_path)
+        with trace.span("preprocess.decode", path=image_path) as sp:
+            img = cv2.imread(image_path)
+            sp.set(shape=None if img is None else list(img.shape))
     else:
         raise ValueError("No image provided")
 
@@ -74,61 +221,286 @@ def preprocess_image(image_path=None, image_array=None):
         raise ValueError("Could not load image")
     
     # Step 1: Image Input & Normalization
-    # Resize max width <= 800 px (maintain aspect ratio)
-    h, w = img.shape[:2]
-    if w > 800:
-        scale = 800 / w
-        new_h = int(h * scale)
-        img = cv2.resize(img, (800, new_h))
+    # Resize by text size (or max width <= 800 px), maintaining aspect ratio
+    scale, size, interpolation, text_height = page_scale(img, max_width, scale_mode)
+    if scale != 1.0:
+        with trace.span("preprocess.resize", img, scale=scale):
+            img = cv2.resize(img, size, interpolation=interpolation)
     # Step 2: Grayscale Conversion
-    gray = to_grayscale(img)
+    with trace.span("preprocess.to_grayscale", img):
+        gray = to_grayscale(img)
     
     # Step 3: Enhance contrast for better text visibility
-    gray = enhance_contrast(gray)
+    with trace.span("preprocess.enhance_contrast", gray):
+        gray = enhance_contrast(gray)
     
     # Step 4: Denoise (remove noise while preserving edges)
-    gray = denoise(gray)
+    # Clean screenshots skip the expensive NLM pass entirely
+    info = {"scale": scale, "text_height": text_height}
+    if denoise_mode == "auto":
+        with trace.span("preprocess.estimate_noise", gray):
+            info["noise_sigma"] = estimate_noise(gray)
+        info["denoise_tier"] = choose_denoise_tier(info["noise_sigma"])
+    else:
+        info["denoise_tier"] = denoise_mode
+    with trace.span("preprocess.denoise", gray, tier=info["denoise_tier"]):
+        gray = denoise(gray, info["denoise_tier"])
     
     # Step 5: Sharpen image to enhance text edges
-    gray = sharpen_image(gray)
+    with trace.span("preprocess.sharpen_image", gray):
+        gray = sharpen_image(gray)
     
     # Step 6: Binarization (convert to black/white)
-    binary = binarize(gray)
+    with trace.span("preprocess.binarize", gray):
+        binary = binarize(gray)
     
     # Step 3: Deskewing (New)
-    angle = get_skew_angle(binary)
-    if abs(angle) > 0.5:
-        binary = rotate_image(binary, angle)
-        # Also rotate the original debug image so they match
-        img = rotate_image(img, angle)
+    # Skip the rotation when the profile is too flat to trust
+    angle, confidence = 0.0, 0.0
+    if deskew:
+        with trace.span("preprocess.estimate_skew", binary) as sp:
+            angle, confidence = estimate_skew(binary)
+            sp.set(angle=angle, confidence=confidence)
+    info["skew_angle"] = angle
+    info["skew_confidence"] = confidence
+    info["deskewed"] = abs(angle) > 0.5 and confidence >= DESKEW_MIN_CONFIDENCE
+    if info["deskewed"]:
+        with trace.span("preprocess.rotate_image", binary, angle=angle):
+            binary = rotate_image(binary, angle)
+            # Also rotate the original debug image so they match
+            img = rotate_image(img, angle)
     
     # Step 4: Morphological cleaning
-    kernel = np.ones((2,2), np.uint8)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+    with trace.span("preprocess.morphology", binary):
+        kernel = np.ones((2,2), np.uint8)
+        binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
     
+    if return_info:
+        return binary, img, info
     return binary, img
 
+def _median_inplace(values):
+    """np.median of an array (same dtype arithmetic), partitioning it in place instead of copying."""
+    flat = values.reshape(-1)
+    k = len(flat) // 2
+    # Two kth values even for odd sizes: single-kth introselect is several
+    # times slower on the duplicate-heavy responses of clean pages
+    flat.partition([k - 1, k])
+    if len(flat) % 2:
+        return flat[k]
+    return (flat[k - 1] + flat[k]) / 2
+
+class Preprocessor:
+    """
+    Reusable preprocess_image for long-running workers.
+
+    The CLAHE object and filter kernels are created once, and every step
+    writes into per-shape scratch buffers through OpenCV dst= arguments, so a
+    stream of same-sized pages does close to zero large allocations (NLM
+    denoising allocates internally; the skew estimate's temporaries are
+    bounded by DESKEW_MAX_POINTS).
+
+    Returned arrays are views of the internal buffers: they are valid until
+    the next process() call, so copy them to keep them. Not thread-safe; use
+    one Preprocessor per worker thread.
+    """
+    def __init__(self, max_width=800, deskew=True, scale_mode="auto"):
+        self.max_width = max_width
+        self.deskew = deskew
+        self.scale_mode = scale_mode
+        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+        self.sharpen_kernel = np.array([[-1,-1,-1],
+                                        [-1, 9,-1],
+                                        [-1,-1,-1]], dtype=np.float32)
+        self.noise_kernel = np.array([[ 1, -2,  1],
+                                      [-2,  4, -2],
+                                      [ 1, -2,  1]], dtype=np.float32)
+        self.open_kernel = np.ones((2,2), np.uint8)
+        self._buffers = {}
+
+    def _buffer(self, name, shape, dtype=np.uint8):
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = self._buffers[name] = np.empty(shape, dtype=dtype)
+        return buf
+
+    def buffer_bytes(self):
+        """Memory currently held in scratch buffers."""
+        return sum(b.nbytes for b in self._buffers.values())
+
+    def estimate_noise(self, gray):
+        """Same estimate as estimate_noise(), reusing a float32 response buffer."""
+        response = cv2.filter2D(gray, cv2.CV_32F, self.noise_kernel,
+                                dst=self._buffer("noise_response", gray.shape, np.float32))
+        sample = response[1:-1:2, 1:-1:2]
+        scratch = np.abs(sample, out=self._buffer("noise_sample", sample.shape, np.float32))
+        return float(_median_inplace(scratch) / (6.0 * 0.6745))
+
+    def process(self, image_path=None, image_array=None, denoise_mode="auto", return_info=False):
+        """
+        Same steps, arguments and results as preprocess_image (with this
+        object's max_width/deskew/scale_mode), but into reused buffers.
+        """
+        if image_array is not None:
+            img = image_array
+        elif image_path:
+            with trace.span("preprocess.decode", path=image_path) as sp:
+                img = cv2.imread(image_path)
+                sp.set(shape=None if img is None else list(img.shape))
+        else:
+            raise ValueError("No image provided")
+
+        if img is None:
+            raise ValueError("Could not load image")
+
+        # Step 1: Image Input & Normalization
+        scale, size, interpolation, text_height = page_scale(img, self.max_width, self.scale_mode)
+        if scale != 1.0:
+            with trace.span("preprocess.resize", img, scale=scale):
+                img = cv2.resize(img, size, dst=self._buffer("resized", (size[1], size[0]) + img.shape[2:]),
+                                 interpolation=interpolation)
+        shape = img.shape[:2]
+
+        # Step 2: Grayscale Conversion
+        with trace.span("preprocess.to_grayscale", img):
+            if img.ndim == 3:
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=self._buffer("gray", shape))
+            else:
+                gray = img
+
+        # Step 3: Contrast
+        with trace.span("preprocess.enhance_contrast", gray):
+            gray = self.clahe.apply(gray, self._buffer("contrast", shape))
+
+        # Step 4: Denoise
+        info = {"scale": scale, "text_height": text_height}
+        if denoise_mode == "auto":
+            with trace.span("preprocess.estimate_noise", gray):
+                info["noise_sigma"] = self.estimate_noise(gray)
+            info["denoise_tier"] = choose_denoise_tier(info["noise_sigma"])
+        else:
+            info["denoise_tier"] = denoise_mode
+        tier = info["denoise_tier"]
+        with trace.span("preprocess.denoise", gray, tier=tier):
+            if tier == "median":
+                gray = cv2.medianBlur(gray, 3, dst=self._buffer("denoised", shape))
+            elif tier == "bilateral":
+                gray = cv2.bilateralFilter(gray, 5, 50, 50, dst=self._buffer("denoised", shape))
+            elif tier != "none":
+                gray = cv2.fastNlMeansDenoising(gray, self._buffer("denoised", shape), h=10,
+                                                templateWindowSize=7, searchWindowSize=21)
+
+        # Step 5: Sharpen
+        with trace.span("preprocess.sharpen_image", gray):
+            gray = cv2.filter2D(gray, -1, self.sharpen_kernel, dst=self._buffer("sharp", shape))
+
+        # Step 6: Binarization (same as binarize(), in place after the blur)
+        with trace.span("preprocess.binarize", gray):
+            binary = cv2.medianBlur(gray, 3, dst=self._buffer("binary", shape))
+            cv2.threshold(binary, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=binary)
+            border = np.mean([binary[:2].mean(), binary[-2:].mean(), binary[:, :2].mean(), binary[:, -2:].mean()])
+            if border > 127:
+                cv2.bitwise_not(binary, dst=binary)
+
+        # Step 7: Deskewing
+        angle, confidence = 0.0, 0.0
+        if self.deskew:
+            with trace.span("preprocess.estimate_skew", binary) as sp:
+                angle, confidence = estimate_skew(binary)
+                sp.set(angle=angle, confidence=confidence)
+        info["skew_angle"] = angle
+        info["skew_confidence"] = confidence
+        info["deskewed"] = abs(angle) > 0.5 and confidence >= DESKEW_MIN_CONFIDENCE
+        if info["deskewed"]:
+            with trace.span("preprocess.rotate_image", binary, angle=angle):
+                M = cv2.getRotationMatrix2D((shape[1] // 2, shape[0] // 2), angle, 1.0)
+                binary = cv2.warpAffine(binary, M, (shape[1], shape[0]), dst=self._buffer("rotated", shape),
+                                        flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+                img = cv2.warpAffine(img, M, (shape[1], shape[0]), dst=self._buffer("rotated_original", img.shape),
+                                     flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+        # Step 8: Morphological cleaning
+        with trace.span("preprocess.morphology", binary):
+            binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, self.open_kernel, dst=self._buffer("cleaned", shape))
+
+        if return_info:
+            return binary, img, info
+        return binary, img
+
+# Settings that change a page's preprocessed output besides denoise_mode
+SETTING_NAMES = ("max_width", "deskew", "scale_mode")
+
+def preprocess_settings(preprocessor=None):
+    """
+    The scaling/deskew settings pages are preprocessed with: the
+    preprocessor's, or preprocess_image's defaults. Equal settings give
+    equal output either way (see benchmark.py --check).
+    """
+    if preprocessor is not None:
+        return {name: getattr(preprocessor, name) for name in SETTING_NAMES}
+    params = inspect.signature(preprocess_image).parameters
+    return {name: params[name].default for name in SETTING_NAMES}
+
+# Deskew works on a strided view of at most this many pixels per side and
+# at most this many sampled foreground points, so its cost does not grow
+# with page size.
+DESKEW_MAX_SIDE = 512
+DESKEW_MAX_POINTS = 20000
+DESKEW_MAX_ANGLE = 15.0
+# Below this confidence the page is left unrotated
+DESKEW_MIN_CONFIDENCE = 0.15
+
+def _projection_scores(ys, xs, angles):
+    """
+    Sharpness (sum of squared bin counts) of the horizontal projection
+    profile of points (ys, xs) after rotating by each of `angles` (degrees),
+    using the same convention as rotate_image.
+    """
+    theta = np.deg2rad(angles)[:, None]
+    rows = np.rint(np.cos(theta) * ys - np.sin(theta) * xs).astype(np.int64)
+    rows -= rows.min()
+    n_bins = int(rows.max()) + 1
+    # One bincount for all angles: offset each angle into its own bin range
+    rows += np.arange(len(angles))[:, None] * n_bins
+    counts = np.bincount(rows.ravel(), minlength=len(angles) * n_bins).reshape(len(angles), n_bins)
+    return (counts.astype(np.float64) ** 2).sum(axis=1)
+
+def estimate_skew(image):
+    """
+    Projection-profile skew estimate on a subsampled binary image.
+    Returns:
+        angle: degrees to pass to rotate_image to deskew
+        confidence: 0 (flat/unreliable) .. 1 (sharp, text-like profile)
+    """
+    h, w = image.shape[:2]
+    step = max(1, int(np.ceil(max(h, w) / float(DESKEW_MAX_SIDE))))
+    ys, xs = np.nonzero(image[::step, ::step])
+    if len(ys) < 10:
+        return 0.0, 0.0
+
+    if len(ys) > DESKEW_MAX_POINTS:
+        pick = np.linspace(0, len(ys) - 1, DESKEW_MAX_POINTS).astype(np.int64)
+        ys, xs = ys[pick], xs[pick]
+    ys = ys - ys.mean()
+    xs = xs - xs.mean()
+
+    # Coarse 1 degree search, then 0.1 degree refinement around the peak
+    coarse = np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + 0.5, 1.0)
+    coarse_scores = _projection_scores(ys, xs, coarse)
+    best = coarse[np.argmax(coarse_scores)]
+    fine = np.arange(best - 1.0, best + 1.05, 0.1)
+    fine_scores = _projection_scores(ys, xs, fine)
+    angle = float(fine[np.argmax(fine_scores)])
+
+    # How much the best angle stands out from the average one
+    confidence = 1.0 - coarse_scores.mean() / max(fine_scores.max(), 1e-9)
+    return round(angle, 2), float(confidence)
+
 def get_skew_angle(image):
     """
-    Calculate skew angle of an image using minimum area rectangle.
+    Calculate skew angle of a binary image (see estimate_skew).
     """
-    # Find all white pixels
-    coords = np.column_stack(np.where(image > 0))
-    
-    # If no text found, return 0
-    if len(coords) < 10:
-        return 0
-        
-    # Get minimum area rectangle
-    angle = cv2.minAreaRect(coords)[-1]
-    
-    # Correct the angle
-    if angle < -45:
-        angle = -(90 + angle)
-    else:
-        angle = -angle
-        
-    return angle
+    return estimate_skew(image)[0]
 
 def rotate_image(image, angle):
     """
@@ -139,3 +511,104 @@ def rotate_image(image, angle):
     M = cv2.getRotationMatrix2D(center, angle, 1.0)
     rotated = cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
     return rotated
+
+# Blank / no-text pre-check, run on a small thumbnail before the real work.
+# Thresholds are conservative: a page is only skipped when it clearly has
+# nothing that could be text (a single short word still passes).
+TEXT_CHECK_SIDE = 512        # Longest thumbnail side (at most)
+TEXT_MIN_CONTRAST = 24.0     # Gray levels between the darkest mark and the paper
+TEXT_MIN_INK = 0.00005       # Minority (ink) pixel fraction after Otsu
+TEXT_MIN_EDGES = 0.00005     # Canny edge pixel fraction
+TEXT_GLYPH_MIN_HEIGHT = 3    # Thumbnail pixels; shorter marks are grain and speckle
+TEXT_GLYPH_ASPECT = (0.1, 12.0)  # Width / height, from a thin stroke to a merged word
+TEXT_GLYPH_MIN_CONTRAST = 60.0   # Mean gray levels between a mark and the pixels around it
+
+def check_text_presence(image):
+    """
+    Fast check whether a page can contain text at all (blank pages,
+    separator sheets, photos of scenes without text, noisy or not).
+    Text means glyph-shaped marks that stand out sharply from their
+    surroundings, at least two side by side or one merged word; a lone
+    letter or a page of faint text is treated as no text.
+    Args:
+        image: BGR or grayscale page, any size
+    Returns:
+        has_text: False only when the page clearly has no text
+        reason: why the page was rejected (None if has_text)
+        stats: dict with contrast, ink_ratio, edge_density, components
+               (glyph candidates that passed every filter)
+    """
+    gray = to_grayscale(image)
+    # Integer-factor area average: fast, and it smooths paper grain and scanner noise
+    h, w = gray.shape[:2]
+    k = max(1, -(-max(h, w) // TEXT_CHECK_SIDE))
+    if k > 1:
+        gray = cv2.resize(gray[:h // k * k, :w // k * k], (w // k, h // k), interpolation=cv2.INTER_AREA)
+    sh, sw = gray.shape
+
+    # 1. Contrast: how far the strongest mark is from the paper (median)
+    paper = int(np.median(gray))
+    stats = {"contrast": float(cv2.absdiff(gray, paper).max())}
+    if stats["contrast"] < TEXT_MIN_CONTRAST:
+        return False, "blank page (no contrast)", stats
+
+    # 2. Ink ratio: text is the minority class of an Otsu split
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if np.count_nonzero(ink) > ink.size // 2:
+        ink = cv2.bitwise_not(ink)
+    stats["ink_ratio"] = np.count_nonzero(ink) / float(ink.size)
+    if stats["ink_ratio"] < TEXT_MIN_INK:
+        return False, "blank page (almost no ink)", stats
+
+    # 3. Edge density: glyphs are all edges
+    edges = cv2.Canny(gray, 50, 150)
+    stats["edge_density"] = np.count_nonzero(edges) / float(edges.size)
+    if stats["edge_density"] < TEXT_MIN_EDGES:
+        return False, "no text (no edges)", stats
+
+    # 4. Glyph-sized components: photos and shapes give a few large blobs,
+    #    sensor noise gives specks too short to be letters
+    n, labels, cc, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    cw, ch, area = cc[:, 2], cc[:, 3], cc[:, 4]
+    aspect = cw / np.maximum(ch, 1).astype(np.float64)
+    glyphs = ((ch >= TEXT_GLYPH_MIN_HEIGHT) & (ch <= max(2, sh // 4)) & (cw <= max(2, sw // 2)) &
+              (aspect >= TEXT_GLYPH_ASPECT[0]) & (aspect <= TEXT_GLYPH_ASPECT[1]))
+    glyphs[0] = False  # Label 0 is the background
+    if glyphs.any():
+        # 5. Local contrast: ink stands out from the paper right around it;
+        #    Otsu splits of shading and grain differ by a few gray levels
+        inside = np.bincount(labels.ravel(), weights=gray.ravel(), minlength=n) / np.maximum(area, 1)
+        # One-pixel ring per component (a ring pixel goes to its highest neighbouring label)
+        grown = cv2.dilate(labels.astype(np.float32), np.ones((3, 3), np.uint8)).astype(np.int32)
+        ring = (labels == 0) & (grown > 0)
+        ring_labels = grown[ring]
+        around = (np.bincount(ring_labels, weights=gray[ring], minlength=n) /
+                  np.maximum(np.bincount(ring_labels, minlength=n), 1))
+        glyphs &= np.abs(around - inside) >= TEXT_GLYPH_MIN_CONTRAST
+    stats["components"] = int(np.count_nonzero(glyphs))
+    if stats["components"] == 0:
+        return False, "no text (no glyph-sized marks)", stats
+
+    # 6. Text comes in rows
+    if not _has_glyph_row(cc[glyphs, :4]):
+        return False, "no text (no glyphs in a row)", stats
+
+    return True, None, stats
+
+def _has_glyph_row(boxes):
+    """
+    Whether (x, y, w, h) glyph boxes contain a run of text: one merged word
+    (at least twice as wide as tall) or two glyphs side by side (rows
+    overlapping by half the shorter one, heights within 2x, gap at most
+    1.5x the taller one).
+    """
+    x, y, w, h = boxes.T
+    if np.any(w >= 2 * h):
+        return True
+    overlap = np.minimum(y[:, None] + h[:, None], y + h) - np.maximum(y[:, None], y)
+    gap = np.maximum(x[:, None], x) - np.minimum(x[:, None] + w[:, None], x + w)
+    tall = np.maximum(h[:, None], h)
+    short = np.minimum(h[:, None], h)
+    pairs = (2 * overlap >= short) & (tall <= 2 * short) & (2 * gap <= 3 * tall)
+    np.fill_diagonal(pairs, False)
+    return bool(pairs.any())
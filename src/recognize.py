@@ -1,24 +1,387 @@
+import asyncio
 import os
+import pickle
+import shlex
+import subprocess
 import pytesseract
 from PIL import Image
 import cv2
 import numpy as np
 
+from src import segment, trace
+
 # Configure Tesseract path (system installation)
-# pytesseract will auto-detect if installed via winget
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# TESSERACT_CMD overrides; the winget install location is used on Windows;
+# everywhere else pytesseract finds `tesseract` on PATH.
+WINDOWS_TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+def _default_tesseract_cmd():
+    cmd = os.environ.get("TESSERACT_CMD")
+    if cmd:
+        return cmd
+    if os.name == "nt" and os.path.exists(WINDOWS_TESSERACT_CMD):
+        return WINDOWS_TESSERACT_CMD
+    return pytesseract.pytesseract.tesseract_cmd
+
+pytesseract.pytesseract.tesseract_cmd = _default_tesseract_cmd()
+
+# Trained by train_model.py
+CHAR_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "char_model.pkl")
+
+class TesseractBackend:
+    """Full-page recognition through the Tesseract binary."""
+    name = "tesseract"
+    engine_name = "Tesseract OCR v5.4"
+    # OPTIMIZED TESSERACT CONFIG for better accuracy
+    # --psm 6: Assume a single uniform block of text
+    # --oem 3: Use both legacy and LSTM OCR engines (best accuracy)
+    config = r'--oem 3 --psm 6'
+    # --psm 7: Treat the image as a single text line (line-parallel mode)
+    line_config = r'--oem 3 --psm 7'
+    # Raise recognition errors instead of returning ("", 0.0) (see Recognizer)
+    raise_errors = False
+
+    def is_available(self):
+        try:
+            pytesseract.get_tesseract_version()
+            return True
+        except Exception:
+            return False
+
+    def supports(self, lang):
+        return True
 
-class Recognizer:
-    def __init__(self):
-        """Initialize Tesseract-based recognizer"""
-        self.engine_name = "Tesseract OCR v5.4"
-        print(f"Loaded {self.engine_name}")
-        
     def get_model_size_mb(self):
-        """Return approximate size of Tesseract engine + data"""
         # Tesseract binary (~2MB) + eng.traineddata (~4MB)
         return 6.0
-        
+
+    def recognize(self, image_array, lang='eng', single_pass=True, single_line=False, **options):
+        """
+        Args:
+            image_array: numpy array of preprocessed image
+            lang: language code (e.g., 'eng', 'hin', 'eng+hin' for multiple)
+            single_pass: run Tesseract once (TSV data) and rebuild the layout
+                         from it instead of a separate image_to_string call
+            single_line: the image is one cropped text line (psm 7)
+            options: options of other backends, ignored
+        Returns:
+            extracted_text: string with preserved layout
+            confidence: average confidence score
+        """
+        custom_config = self.line_config if single_line else self.config
+        try:
+            if single_pass:
+                # One Tesseract run, image over stdin and TSV over stdout (no temp files)
+                data = run_tesseract(image_array, lang, custom_config)
+                return layout_text_from_data(data).strip(), average_confidence(data)
+
+            # Legacy: pytesseract temp files, second full recognition just for the text
+            pil_image = Image.fromarray(image_array)
+            data = pytesseract.image_to_data(pil_image, lang=lang, config=custom_config, output_type=pytesseract.Output.DICT)
+            text = pytesseract.image_to_string(pil_image, lang=lang, config=custom_config)
+            return text.strip(), average_confidence(data)
+
+        except Exception as e:
+            if self.raise_errors:
+                raise
+            print(f"Tesseract extraction error: {e}")
+            return "", 0.0
+
+    async def recognize_async(self, image_array, lang='eng'):
+        """
+        Same as recognize(), but Tesseract runs as an asyncio subprocess fed
+        through stdin, so one event loop can drive many pages at once.
+        Cancelling the awaiting task kills the Tesseract process.
+        """
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *tesseract_command(lang, self.config),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **_subprocess_options()
+            )
+        except OSError as e:
+            # Missing/unlaunchable binary: same failure result as recognize()
+            if self.raise_errors:
+                raise
+            print(f"Tesseract extraction error: {e}")
+            return "", 0.0
+        try:
+            stdout, stderr = await proc.communicate(encode_image(image_array))
+        except asyncio.CancelledError:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+
+        if proc.returncode != 0:
+            message = stderr.decode(errors='replace').strip() or f"exit status {proc.returncode}"
+            if self.raise_errors:
+                raise RuntimeError(message)
+            print(f"Tesseract extraction error: {message}")
+            return "", 0.0
+        data = parse_tsv(stdout.decode("utf-8", errors="replace"))
+        return layout_text_from_data(data).strip(), average_confidence(data)
+
+# Glyph normalization, identical to train_model.resize_and_pad_high_res:
+# scale the longest side to 24px, center on a 28x28 black canvas.
+GLYPH_SIZE = 28
+GLYPH_BOX = 24
+
+def normalize_glyphs(rois):
+    """
+    Normalize all ROIs of a page into one preallocated feature matrix.
+    Args:
+        rois: list of 2D uint8 glyph images
+    Returns:
+        X: (N, 784) float32 matrix in [0, 1], one row per ROI
+        valid: (N,) bool mask, False for empty ROIs (their rows stay zero)
+    """
+    n = len(rois)
+    X = np.zeros((n, GLYPH_SIZE * GLYPH_SIZE), dtype=np.float32)
+    valid = np.zeros(n, dtype=bool)
+    canvases = X.reshape(n, GLYPH_SIZE, GLYPH_SIZE)
+
+    for i, roi in enumerate(rois):
+        h, w = roi.shape[:2]
+        if h == 0 or w == 0:
+            continue
+        scale = float(GLYPH_BOX) / max(h, w)
+        new_w = max(1, int(w * scale))
+        new_h = max(1, int(h * scale))
+        x_off = (GLYPH_SIZE - new_w) // 2
+        y_off = (GLYPH_SIZE - new_h) // 2
+        # Write straight into this row of the matrix (no per-glyph canvas)
+        canvases[i, y_off:y_off+new_h, x_off:x_off+new_w] = cv2.resize(roi, (new_w, new_h), interpolation=cv2.INTER_AREA)
+        valid[i] = True
+
+    X *= 1.0 / 255.0
+    return X, valid
+
+_ACTIVATIONS = {
+    "identity": lambda z: z,
+    "relu": lambda z: np.maximum(z, 0, out=z),
+    "tanh": lambda z: np.tanh(z, out=z),
+    "logistic": lambda z: np.reciprocal(1.0 + np.exp(-z), out=z),
+}
+
+class CharClassifierBackend:
+    """
+    In-process recognition: segment.process_image_end_to_end ROIs classified
+    by the MLP from train_model.py. No subprocess, English A-Z/0-9/.,  only.
+    """
+    name = "char_model"
+    engine_name = "TinyWorld Char MLP"
+    languages = ("eng",)
+    raise_errors = False
+
+    def __init__(self, model_path=CHAR_MODEL_PATH):
+        self.model_path = os.path.abspath(model_path)
+        self._model = None
+        self._layers = None
+        self._labels = None
+
+    def is_available(self):
+        return os.path.exists(self.model_path)
+
+    def supports(self, lang):
+        return lang in self.languages
+
+    def get_model_size_mb(self):
+        if not self.is_available():
+            return 0.0
+        return os.path.getsize(self.model_path) / (1024 * 1024)
+
+    @property
+    def model(self):
+        # Loaded lazily so constructing a Recognizer stays cheap
+        if self._model is None:
+            with open(self.model_path, "rb") as f:
+                self._model = pickle.load(f)
+            # float32 copies of the weights for the batched forward pass
+            self._layers = [(W.astype(np.float32), b.astype(np.float32))
+                            for W, b in zip(self._model.coefs_, self._model.intercepts_)]
+            self._labels = np.asarray(self._model.custom_classes_)[self._model.classes_].astype(str)
+        return self._model
+
+    def predict_proba(self, X):
+        """Single vectorized MLP forward pass over an (N, 784) float32 matrix."""
+        model = self.model
+        hidden = _ACTIVATIONS[model.activation]
+        z = X
+        for W, b in self._layers[:-1]:
+            z = hidden(z @ W + b)
+        W, b = self._layers[-1]
+        z = z @ W + b
+
+        if model.out_activation_ == "softmax":
+            z -= z.max(axis=1, keepdims=True)
+            np.exp(z, out=z)
+            z /= z.sum(axis=1, keepdims=True)
+        else:
+            z = _ACTIVATIONS[model.out_activation_](z)
+        return z
+
+    def recognize(self, image_array, lang='eng', **options):
+        """
+        Args:
+            image_array: binary image, white text on black (preprocess output)
+            lang: only 'eng' is supported
+            options: Tesseract-only options (single_pass, single_line) are ignored;
+                     a one-line crop is segmented like any other image
+        Returns:
+            extracted_text: lines joined by newlines, words by spaces
+            confidence: mean top-class probability over all glyphs
+        """
+        try:
+            lines = segment.process_image_end_to_end(image_array, pool_gaps=True)
+
+            # Flatten the page: one entry per glyph plus index arrays
+            rois = [c["img"] for line_chars in lines for c in line_chars]
+            if not rois:
+                return "", 0.0
+            line_idx = np.repeat(np.arange(len(lines)), [len(l) for l in lines])
+            spaces = np.fromiter((c["space"] for l in lines for c in l), dtype=bool, count=len(rois))
+
+            X, valid = normalize_glyphs(rois)
+            X, line_idx, spaces = X[valid], line_idx[valid], spaces[valid]
+            if len(X) == 0:
+                return "", 0.0
+
+            probs = self.predict_proba(X)
+            glyphs = self._labels[probs.argmax(axis=1)]
+            glyphs = np.where(spaces, np.char.add(glyphs, " "), glyphs)
+
+            # Reassemble lines from the line index array
+            bounds = np.flatnonzero(np.diff(line_idx)) + 1
+            text_lines = ["".join(chunk).strip() for chunk in np.split(glyphs, bounds)]
+
+            return "\n".join(text_lines).strip(), float(probs.max(axis=1).mean())
+
+        except Exception as e:
+            if self.raise_errors:
+                raise
+            print(f"Char model extraction error: {e}")
+            return "", 0.0
+
+class StubBackend:
+    """Deterministic backend for tests: returns fixed text, records calls."""
+    name = "stub"
+    engine_name = "Stub"
+
+    def __init__(self, text="", confidence=1.0):
+        self.text = text
+        self.confidence = confidence
+        self.calls = []
+
+    def is_available(self):
+        return True
+
+    def supports(self, lang):
+        return True
+
+    def get_model_size_mb(self):
+        return 0.0
+
+    def recognize(self, image_array, lang='eng', **options):
+        self.calls.append((getattr(image_array, "shape", None), lang))
+        return self.text, self.confidence
+
+class RoutingBackend:
+    """
+    Tries backends cheapest-first and keeps the first result that is
+    non-empty and at least `min_confidence`; otherwise the last result.
+    """
+    name = "auto"
+
+    def __init__(self, backends, min_confidence=0.85):
+        self.backends = [b for b in backends if b.is_available()]
+        self.min_confidence = min_confidence
+        self.engine_name = " → ".join(b.engine_name for b in self.backends)
+
+    def is_available(self):
+        return bool(self.backends)
+
+    def supports(self, lang):
+        return any(b.supports(lang) for b in self.backends)
+
+    def get_model_size_mb(self):
+        return sum(b.get_model_size_mb() for b in self.backends)
+
+    def recognize(self, image_array, lang='eng', **options):
+        text, confidence = "", 0.0
+        succeeded, error = False, None
+        for backend in self.backends:
+            if not backend.supports(lang):
+                continue
+            try:
+                text, confidence = backend.recognize(image_array, lang=lang, **options)
+            except Exception as e:
+                # Only backends with raise_errors get here; try the next one
+                error = e
+                continue
+            succeeded = True
+            if text and confidence >= self.min_confidence:
+                break
+        if error is not None and not succeeded:
+            raise error
+        return text, confidence
+
+BACKENDS = {
+    TesseractBackend.name: TesseractBackend,
+    CharClassifierBackend.name: CharClassifierBackend,
+    StubBackend.name: StubBackend,
+}
+
+def create_backend(name, **options):
+    """Builds a backend by name ('tesseract', 'char_model', 'stub' or 'auto')."""
+    if name == RoutingBackend.name:
+        return RoutingBackend([CharClassifierBackend(), TesseractBackend()], **options)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown recognition backend: {name}")
+    return BACKENDS[name](**options)
+
+def _model_identity(backend):
+    """':size:mtime' of a backend's model file, so a retrained model is a new token."""
+    model_path = getattr(backend, "model_path", None)
+    if not model_path:
+        return ""
+    try:
+        st = os.stat(model_path)
+    except OSError:
+        return ":missing"
+    return f":{st.st_size}:{st.st_mtime_ns}"
+
+class Recognizer:
+    def __init__(self, backend="tesseract", raise_errors=False, **backend_options):
+        """
+        Initialize recognizer.
+        Args:
+            backend: backend name (see create_backend) or a backend instance
+            raise_errors: let recognition errors (missing binary or language
+                          data, bad model file) raise instead of printing
+                          them and returning an empty result
+            backend_options: passed to the backend constructor
+        """
+        if isinstance(backend, str):
+            backend = create_backend(backend, **backend_options)
+        if raise_errors:
+            for b in getattr(backend, "backends", [backend]):
+                b.raise_errors = True
+        self.backend = backend
+        self.engine_name = backend.engine_name
+        print(f"Loaded {self.engine_name}")
+
+    def get_model_size_mb(self):
+        """Return approximate size of the recognition engine + data"""
+        return self.backend.get_model_size_mb()
+
+    def cache_token(self):
+        """Identifies everything about this recognizer that affects its output."""
+        backends = getattr(self.backend, "backends", [self.backend])
+        return ";".join(f"{b.name}:{getattr(b, 'config', '')}{_model_identity(b)}" for b in backends)
+
     def extract_text_from_image(self, image_array):
         """
         Extract text from entire image using Tesseract.
@@ -59,38 +422,142 @@ class Recognizer:
         except Exception as e:
             print(f"Tesseract extraction error: {e}")
             return "", 0.0
-    
-    def extract_text_with_layout(self, image_array, lang='eng'):
+
+    def extract_text_with_layout(self, image_array, lang='eng', **options):
         """
-        Extract text preserving layout (line breaks).
-        
+        Extract text preserving layout (line breaks) with the configured backend.
+
         Args:
             image_array: numpy array of preprocessed image
             lang: language code (e.g., 'eng', 'hin', 'eng+hin' for multiple)
-            
+            options: backend-specific options (e.g. single_pass for Tesseract);
+                     backends ignore the ones they don't support
+
         Returns:
             extracted_text: string with preserved layout
             confidence: average confidence score
         """
-        try:
-            # Convert to PIL Image
-            pil_image = Image.fromarray(image_array)
-            
-            # OPTIMIZED TESSERACT CONFIG for better accuracy
-            # --psm 6: Assume a single uniform block of text
-            # --oem 3: Use both legacy and LSTM OCR engines (best accuracy)
-            custom_config = r'--oem 3 --psm 6'
-            
-            # Use Tesseract to extract text with layout and specified language
-            text = pytesseract.image_to_string(pil_image, lang=lang, config=custom_config)
-            
-            # Get confidence data
-            data = pytesseract.image_to_data(pil_image, lang=lang, config=custom_config, output_type=pytesseract.Output.DICT)
-            confidences = [c / 100.0 for c in data['conf'] if c > 0]
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
-            
-            return text.strip(), avg_confidence
-            
-        except Exception as e:
-            print(f"Tesseract extraction error: {e}")
-            return "", 0.0
+        with trace.span("recognize." + self.backend.name, image_array, lang=lang, **options) as sp:
+            text, confidence = self.backend.recognize(image_array, lang=lang, **options)
+            sp.set(chars=len(text), confidence=confidence)
+        return text, confidence
+
+    async def extract_text_with_layout_async(self, image_array, lang='eng', executor=None):
+        """
+        Async extract_text_with_layout. Backends with a native async path
+        (Tesseract subprocess) use it; the rest run in `executor`.
+        """
+        with trace.span("recognize." + self.backend.name, image_array, lang=lang) as sp:
+            recognize_async = getattr(self.backend, "recognize_async", None)
+            if recognize_async is not None:
+                text, confidence = await recognize_async(image_array, lang=lang)
+            else:
+                loop = asyncio.get_running_loop()
+                text, confidence = await loop.run_in_executor(
+                    executor, lambda: self.backend.recognize(image_array, lang=lang))
+            sp.set(chars=len(text), confidence=confidence)
+        return text, confidence
+
+def layout_text_from_data(data):
+    """
+    Rebuild image_to_string-style text from image_to_data output.
+    Words on the same (block, paragraph, line) are joined by spaces,
+    lines by newlines, and paragraphs/blocks by a blank line.
+    """
+    lines = []
+    current_key = None
+    current_par = None
+
+    for i, word in enumerate(data['text']):
+        if data['level'][i] != 5:  # Only word-level rows carry text
+            continue
+        word = word.strip()
+        if not word:
+            continue
+
+        par_key = (data['page_num'][i], data['block_num'][i], data['par_num'][i])
+        line_key = par_key + (data['line_num'][i],)
+
+        if line_key != current_key:
+            if current_par is not None and par_key != current_par:
+                lines.append([])  # Blank line between paragraphs
+            lines.append([])
+            current_key = line_key
+            current_par = par_key
+        lines[-1].append(word)
+
+    return "\n".join(" ".join(words) for words in lines)
+
+def average_confidence(data):
+    """Mean word confidence (0-1) from image_to_data-style output."""
+    confidences = [c / 100.0 for c in data['conf'] if c > 0]
+    return sum(confidences) / len(confidences) if confidences else 0.0
+
+def tesseract_command(lang, config):
+    """Tesseract CLI reading the image from stdin and writing TSV to stdout."""
+    return [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout", "-l", lang] + shlex.split(config) + ["tsv"]
+
+def encode_pgm(image_array):
+    """Uncompressed binary PGM (P5) of a grayscale image: a header plus the raw pixels."""
+    if image_array.ndim == 3:
+        image_array = cv2.cvtColor(image_array, cv2.COLOR_BGR2GRAY)
+    h, w = image_array.shape
+    header = f"P5\n{w} {h}\n255\n".encode("ascii")
+    return header + np.ascontiguousarray(image_array, dtype=np.uint8).tobytes()
+
+def encode_pbm(binary):
+    """Packed 1-bit PBM (P4) of a 0/255 image, 8x smaller than PGM (1 bits = black = 0 pixels)."""
+    h, w = binary.shape
+    header = f"P4\n{w} {h}\n".encode("ascii")
+    return header + np.packbits(binary == 0, axis=1).tobytes()
+
+def encode_image(image_array):
+    """PBM for binary (0/255) images such as preprocess output, PGM otherwise."""
+    if image_array.ndim == 2 and image_array.dtype == np.uint8:
+        if not np.any((image_array != 0) & (image_array != 255)):
+            return encode_pbm(image_array)
+    return encode_pgm(image_array)
+
+def _subprocess_options():
+    """Keep Windows from flashing a console window per Tesseract run (as pytesseract does)."""
+    if os.name != "nt":
+        return {}
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return {"startupinfo": startupinfo}
+
+def run_tesseract(image_array, lang, config):
+    """
+    Run Tesseract on an in-memory image: the image goes to stdin as PBM/PGM
+    and the TSV result is read from stdout, so nothing touches the disk.
+    Returns:
+        data: dict of lists, as image_to_data(Output.DICT)
+    """
+    proc = subprocess.run(tesseract_command(lang, config), input=encode_image(image_array),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, **_subprocess_options())
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.decode(errors="replace").strip() or f"exit status {proc.returncode}")
+    return parse_tsv(proc.stdout.decode("utf-8", errors="replace"))
+
+_TSV_INT_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                    "left", "top", "width", "height")
+
+def parse_tsv(tsv):
+    """Parse Tesseract TSV output into the same dict of lists as image_to_data(Output.DICT)."""
+    rows = tsv.splitlines()
+    if not rows:
+        return {name: [] for name in _TSV_INT_COLUMNS + ("conf", "text")}
+    header = rows[0].split("\t")
+    data = {name: [] for name in header}
+    for row in rows[1:]:
+        fields = row.split("\t")
+        if len(fields) < len(header) - 1:
+            continue
+        fields += [""] * (len(header) - len(fields))  # Rows without text
+        for name, value in zip(header, fields):
+            if name in _TSV_INT_COLUMNS:
+                value = int(value)
+            elif name == "conf":
+                value = float(value)
+            data[name].append(value)
+    return data
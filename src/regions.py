@@ -0,0 +1,96 @@
+"""
+Text-region cropping before recognition.
+
+Tesseract's cost grows with pixel count, and sparse pages (forms, receipts,
+screenshots) are mostly empty margin. segment.detect_text_regions finds the
+inked blocks on a cheap density grid; only those crops are recognized, and
+their boxes are also mapped back to input-image coordinates. Pages where the regions cover
+most of the area are recognized whole, since cropping would not save work.
+"""
+import cv2
+import numpy as np
+
+from src import segment, trace
+from src.lines import reading_order, recognize_crops
+
+MAX_COVERAGE = 0.6   # Above this fraction of the page, recognize the full page
+MAX_REGIONS = 24     # More regions than this: per-crop overhead outweighs the savings
+
+def to_input_box(box, preprocess_info, page_shape):
+    """
+    Map an (x, y, w, h) box on the preprocessed page back to input-image
+    pixels: undo the deskew rotation (about the page center, as
+    preprocess.rotate_image), then the resize.
+    Args:
+        preprocess_info: info dict from preprocess_image (scale, skew_angle, deskewed)
+        page_shape: shape of the preprocessed page
+    Returns:
+        [x, y, w, h] bounding box of the mapped region, clipped to the input
+    """
+    h, w = page_shape[:2]
+    x, y, bw, bh = box
+    corners = np.array([[x, y], [x + bw, y], [x, y + bh], [x + bw, y + bh]], dtype=np.float64)
+    if preprocess_info.get("deskewed"):
+        M = cv2.getRotationMatrix2D((w // 2, h // 2), preprocess_info["skew_angle"], 1.0)
+        inverse = cv2.invertAffineTransform(M)
+        corners = corners @ inverse[:, :2].T + inverse[:, 2]
+    scale = preprocess_info.get("scale", 1.0)
+    corners /= scale
+    x0, y0 = np.clip(np.floor(corners.min(axis=0)), 0, None)
+    x1 = min(np.ceil(corners[:, 0].max()), round(w / scale))
+    y1 = min(np.ceil(corners[:, 1].max()), round(h / scale))
+    return [int(x0), int(y0), int(max(0, x1 - x0)), int(max(0, y1 - y0))]
+
+def recognize_regions(recognizer, binary, lang='eng', workers=None,
+                      max_coverage=MAX_COVERAGE, max_regions=MAX_REGIONS, preprocess_info=None):
+    """
+    Recognize only the text regions of a preprocessed page.
+    Args:
+        recognizer: a loaded recognize.Recognizer
+        binary: preprocessed page (preprocess_image output)
+        workers: concurrent region recognitions (default: cores)
+        preprocess_info: preprocess info of `binary`; when given, every
+                         region also gets 'page_box' (see to_input_box)
+    Returns:
+        text: region texts in reading order
+        confidence: character-weighted mean confidence of the regions
+        regions: list of dicts with 'box' (preprocessed page, i.e. scaled
+                 and deskewed, coordinates), 'text' and 'confidence', plus
+                 'page_box' in input-image pixels; empty when the full page
+                 was recognized
+    """
+    with trace.span("regions.detect", binary) as sp:
+        boxes = segment.detect_text_regions(binary)
+        coverage = sum(w * h for _, _, w, h in boxes) / float(binary.shape[0] * binary.shape[1])
+        sp.set(regions=len(boxes), coverage=round(coverage, 3))
+
+    if not boxes or coverage > max_coverage or len(boxes) > max_regions:
+        text, confidence = recognizer.extract_text_with_layout(binary, lang=lang)
+        return text, confidence, []
+
+    rows = reading_order(boxes)
+    ordered = [box for row in rows for box in row]
+    results = iter(recognize_crops(recognizer, binary, ordered, lang=lang, workers=workers))
+
+    regions = []
+    text_rows = []
+    for row in rows:
+        parts = []
+        for box in row:
+            text, confidence = next(results)
+            text = text.strip()
+            region = {"box": list(box), "text": text, "confidence": confidence}
+            if preprocess_info is not None:
+                region["page_box"] = to_input_box(box, preprocess_info, binary.shape)
+            regions.append(region)
+            if text:
+                parts.append(text)
+        if parts:
+            # Side-by-side single-line regions (label: value) stay on one line
+            sep = "\n" if any("\n" in p for p in parts) else " "
+            text_rows.append(sep.join(parts))
+
+    weights = [len(r["text"]) for r in regions]
+    total = sum(weights)
+    avg_confidence = sum(r["confidence"] * w for r, w in zip(regions, weights)) / total if total else 0.0
+    return "\n".join(text_rows), avg_confidence, regions
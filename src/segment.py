@@ -30,51 +30,143 @@ def detect_lines(binary_image, debug_image=None):
     lines.sort(key=lambda b: b[1])
     return lines
 
+REGION_CELL = 8         # Ink-density grid cell size in pixels
+REGION_MIN_INK = 0.02   # Fraction of ink that marks a cell as text
+REGION_JOIN = (5, 2)    # Cells bridged horizontally/vertically to join words into blocks
+REGION_PAD = 6          # Pixels of margin kept around each region
+
+def detect_text_regions(binary_image, cell=REGION_CELL, min_ink=REGION_MIN_INK, join=REGION_JOIN,
+                        pad=REGION_PAD):
+    """
+    Cheap text-region detection on an ink-density grid.
+    The page (white text on black) is averaged down to one value per cell,
+    cells with ink are joined into blocks, and each block becomes a region.
+    Isolated single cells (specks) are dropped.
+    Returns:
+        regions: (x, y, w, h) boxes in page coordinates, top-to-bottom
+    """
+    h, w = binary_image.shape[:2]
+    gw, gh = max(1, -(-w // cell)), max(1, -(-h // cell))
+    # INTER_AREA averages each cell: mean ink in 0-255
+    density = cv2.resize(binary_image, (gw, gh), interpolation=cv2.INTER_AREA)
+    mask = (density > min_ink * 255).astype(np.uint8)
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, join)
+    blocks = cv2.dilate(mask, kernel, iterations=1)
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(blocks, connectivity=8)
+
+    # Ink cells per block: a lone speck has just one
+    ink_cells = np.bincount(labels[mask > 0], minlength=count)
+
+    regions = []
+    for i in range(1, count):
+        if ink_cells[i] < 2:
+            continue
+        cx, cy, cw, ch = stats[i, :4]
+        # Dilation grows blocks around the kernel anchor; trim it back, then pad
+        x0 = max(0, (cx + (join[0] - 1) // 2) * cell - pad)
+        y0 = max(0, (cy + (join[1] - 1) // 2) * cell - pad)
+        x1 = min(w, (cx + cw - join[0] // 2) * cell + pad)
+        y1 = min(h, (cy + ch - join[1] // 2) * cell + pad)
+        if x1 > x0 and y1 > y0:
+            regions.append((int(x0), int(y0), int(x1 - x0), int(y1 - y0)))
+
+    regions.sort(key=lambda b: (b[1], b[0]))
+    return regions
+
 def segment_chars_from_line(binary_line_region):
     """
     Step 6: Character Segmentation with Smart Filtering.
     """
     # NO DILATION - prevents character merging
-    cnts, _ = cv2.findContours(binary_line_region, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes, keep = _component_boxes(binary_line_region)
+    if _any_enclosed(boxes, keep):
+        # Outer shapes only, as an external contour search finds them: specks
+        # inside the holes of a glyph are filled into it (its box is unchanged)
+        boxes, keep = _component_boxes(_fill_holes(binary_line_region))
     
-    raw_boxes = []
-    for c in cnts:
-        x, y, w, h = cv2.boundingRect(c)
-        
+    # Merge overlapping boxes (handles split characters like "W" → "V V")
+    merged_boxes = merge_overlapping_boxes(boxes[keep])
+    
+    # Convert to expected format (already sorted by x)
+    return [(x, y, w, h, 0, 0) for x, y, w, h in merged_boxes.tolist()]
+
+def _component_boxes(binary):
+    """
+    Boxes of the 8-connected components and which of them pass the filters.
+    Returns:
+        boxes: (N, 4) int array of x, y, w, h, in reverse (bottom-up) label
+               order like findContours, so boxes with equal x keep the same
+               order through the sort and merge
+        keep: bool mask of plausible characters
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    boxes = stats[:0:-1, :4]  # Label 0 is the background
+    w = boxes[:, 2]
+    h = boxes[:, 3]
+    aspect = w / np.maximum(h, 1).astype(np.float64)
+    
+    keep = (
         # Filter 1: Minimum size (remove noise)
-        if w < 3 or h < 8:
-            continue
-            
+        (w >= 3) & (h >= 8) &
         # Filter 2: Aspect ratio (remove fragments and merged chars)
-        aspect = w / float(h)
-        if aspect > 3.0:  # Too wide = merged characters
-            continue
-        if aspect < 0.1:  # Too thin = vertical line artifact
-            continue
-            
+        # Too wide = merged characters, too thin = vertical line artifact
+        (aspect <= 3.0) & (aspect >= 0.1) &
         # Filter 3: Maximum size (remove full-line boxes)
-        if w > 100 or h > 100:
-            continue
-            
-        raw_boxes.append([x, y, w, h])
-    
-    # Merge overlapping boxes (handles split characters like "W" → "V V")
-    merged_boxes = merge_overlapping_boxes(raw_boxes)
-    
-    # Convert to expected format
-    chars = [(x, y, w, h, 0, 0) for x, y, w, h in merged_boxes]
-    chars.sort(key=lambda b: b[0])
-    return chars
+        (w <= 100) & (h <= 100)
+    )
+    return boxes, keep
+
+def _any_enclosed(boxes, keep):
+    """Whether a kept box lies strictly inside another box (a shape in a hole must)."""
+    # Only boxes taller than any kept one (Filter 1) by 2 can hold one.
+    # As (x0, y0, -x1, -y1), "strictly inside" is < on all four
+    outer, inner = (np.concatenate((b[:, :2], -(b[:, :2] + b[:, 2:])), axis=1)
+                    for b in (boxes[boxes[:, 3] >= 10], boxes[keep]))
+    return bool((outer < inner[:, None]).all(axis=2).any())
+
+def _fill_holes(binary):
+    """
+    Binary image with every hole filled: a background region the border
+    can't reach (4-connected) becomes foreground, joining its enclosing
+    shape. Returns 0/1 uint8.
+    """
+    rows, cols = binary.shape
+    padded = np.zeros((rows + 2, cols + 2), np.uint8)
+    padded[1:-1, 1:-1] = binary != 0  # Any nonzero pixel is foreground
+    cv2.floodFill(padded, None, (0, 0), 2, flags=4)
+    return (padded[1:-1, 1:-1] != 2).view(np.uint8)
 
 def merge_overlapping_boxes(boxes):
-    """Merge boxes that overlap horizontally by >30%"""
-    if not boxes:
-        return []
+    """
+    Merge boxes that overlap horizontally by >30% and are vertically aligned.
+    Args:
+        boxes: (N, 4) int array (or list) of x, y, w, h
+    Returns:
+        merged: (M, 4) int array sorted by x
+    """
+    boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+    if len(boxes) < 2:
+        return boxes
         
-    boxes = sorted(boxes, key=lambda b: b[0])  # Sort by x
-    merged = [boxes[0]]
+    boxes = boxes[np.argsort(boxes[:, 0], kind="stable")]  # Sort by x
+    
+    # A box can only merge into the group before it if some earlier box
+    # reaches past its left edge. Split into runs at every other box; runs of
+    # one box (the common case) need no further work.
+    reach = np.maximum.accumulate(boxes[:, 0] + boxes[:, 2])
+    starts = np.flatnonzero(reach[:-1] <= boxes[1:, 0]) + 1
+    if len(starts) == len(boxes) - 1:
+        return boxes
     
-    for current in boxes[1:]:
+    runs = np.split(boxes, starts)
+    return np.concatenate([run if len(run) == 1 else _merge_run(run) for run in runs])
+
+def _merge_run(boxes):
+    """Sequential merge within one run of x-overlapping boxes."""
+    merged = [boxes[0].tolist()]
+    
+    for current in boxes[1:].tolist():
         last = merged[-1]
         
         # Check horizontal overlap
@@ -98,17 +190,45 @@ def merge_overlapping_boxes(boxes):
         else:
             merged.append(current)
     
-    return merged
+    return np.array(merged, dtype=np.int32)
+
+# Lines with fewer gaps than this use the page-level threshold when pooling
+MIN_LINE_GAPS = 4
 
-def process_image_end_to_end(binary, original_debug=None):
+def two_class_threshold(values):
     """
-    Orchestrates Steps 4-6 and returns structured data.
+    Exact 1-D two-class split (Otsu/Jenks): the cut of the sorted values
+    that maximizes between-class variance, i.e. the optimal 1-D 2-means.
+    Returns:
+        threshold: midpoint of the two class means, or None if the values
+                   have no spread (nothing to split)
     """
-    from sklearn.cluster import KMeans
+    v = np.sort(np.asarray(values, dtype=np.float64))
+    n = len(v)
+    if n < 2 or v[0] == v[-1]:
+        return None
+    
+    csum = np.cumsum(v)
+    k = np.arange(1, n)  # Size of the lower class for each cut
+    mu0 = csum[:-1] / k
+    mu1 = (csum[-1] - csum[:-1]) / (n - k)
+    between = k * (n - k) * (mu0 - mu1) ** 2
+    between[v[:-1] == v[1:]] = -1  # Only cut between distinct values
+    
+    i = np.argmax(between)
+    return (mu0[i] + mu1[i]) / 2
 
+def process_image_end_to_end(binary, original_debug=None, pool_gaps=False):
+    """
+    Orchestrates Steps 4-6 and returns structured data.
+    Args:
+        pool_gaps: short lines (< MIN_LINE_GAPS gaps) use a word-gap
+                   threshold computed over the whole page
+    """
     lines_bboxes = detect_lines(binary, original_debug)
-    structured_output = []
     
+    # Pass 1: characters and inter-character gaps per line
+    lines = []
     for (lx, ly, lw, lh) in lines_bboxes:
         line_binary = binary[ly:ly+lh, lx:lx+lw]
         char_bboxes = segment_chars_from_line(line_binary)
@@ -117,32 +237,24 @@ def process_image_end_to_end(binary, original_debug=None):
             continue
             
         # Step 8: Word Reconstruction (Gap Analysis)
-        # 1. Collect all gaps
-        gaps = []
-        # Re-calc bboxes with padding applied for gap logic
-        real_boxes = []
-        for (cx, cy, cw, ch, px, py) in char_bboxes:
-             real_boxes.append((cx, cy, cw, ch))
-
-        for i in range(len(real_boxes) - 1):
-            curr_end = real_boxes[i][0] + real_boxes[i][2]
-            next_start = real_boxes[i+1][0]
-            gaps.append(max(0, next_start - curr_end))
-            
-        # 2. Cluster gaps
-        space_threshold = 999
-        if len(gaps) > 1:
-            try:
-                gaps_np = np.array(gaps).reshape(-1, 1)
-                kmeans = KMeans(n_clusters=2, n_init=10, random_state=42).fit(gaps_np)
-                centers = sorted(kmeans.cluster_centers_.flatten())
-                space_threshold = (centers[0] + centers[1]) / 2
-            except:
-                avg_w = np.mean([b[2] for b in real_boxes])
-                space_threshold = avg_w * 0.5
-        elif real_boxes:
-             avg_w = np.mean([b[2] for b in real_boxes])
-             space_threshold = avg_w * 0.5
+        boxes = np.array(char_bboxes, dtype=np.int32)
+        gaps = np.maximum(0, boxes[1:, 0] - (boxes[:-1, 0] + boxes[:-1, 2]))
+        lines.append((lx, ly, line_binary, char_bboxes, boxes, gaps))
+    
+    page_threshold = None
+    if pool_gaps and lines:
+        page_threshold = two_class_threshold(np.concatenate([l[5] for l in lines]))
+    
+    # Pass 2: split gaps into letter/word spacing and cut out the ROIs
+    structured_output = []
+    for (lx, ly, line_binary, char_bboxes, boxes, gaps) in lines:
+        space_threshold = None
+        if len(gaps) > 1 and not (page_threshold is not None and len(gaps) < MIN_LINE_GAPS):
+            space_threshold = two_class_threshold(gaps)
+        elif page_threshold is not None:
+            space_threshold = page_threshold
+        if space_threshold is None:
+            space_threshold = boxes[:, 2].mean() * 0.5
 
         line_chars = []
         h_line, w_line = line_binary.shape
@@ -162,17 +274,11 @@ def process_image_end_to_end(binary, original_debug=None):
                 cv2.rectangle(original_debug, (gx, gy), (lx + x2, ly + y2), (0, 255, 0), 1)
             
             # Check for space after
-            is_space = False
-            if i < len(char_bboxes) - 1:
-                curr_end = cx + cw
-                next_start = char_bboxes[i+1][0]
-                dist = next_start - curr_end
-                if dist >= space_threshold:
-                    is_space = True
+            is_space = i < len(gaps) and gaps[i] >= space_threshold
                     
             line_chars.append({
                 "img": char_roi,
-                "space": is_space
+                "space": bool(is_space)
             })
             
         structured_output.append(line_chars)
@@ -0,0 +1,399 @@
+"""
+Local OCR HTTP service (stdlib only, fully offline).
+
+Usage:
+    python -m src.server [--host 127.0.0.1] [--port 8080] [--workers 4] [--max-queue 32]
+
+Endpoints:
+    POST /ocr       raw image bytes as the body; query options lang, safe (0/1),
+                    denoise, tiled (0/1), lines (0/1), regions (0/1),
+                    deadline_ms. Returns the pipeline result as JSON.
+    GET  /healthz   200 when the recognizer is loaded and accepting work
+    GET  /metrics   Prometheus text: queue length, per-stage latency
+                    histograms, request counts, throughput and peak RSS
+
+One Recognizer is loaded at startup and shared by a fixed pool of worker
+threads. Requests wait in a bounded queue: when it is full the server answers
+429 (retry later) instead of piling up work; while shutting down it answers
+503. A request whose deadline passes while queued is dropped before any work
+is done and answered with 504.
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from src import cache, pipeline, preprocess, recognize, trace
+
+# Latency histogram buckets in milliseconds (upper bounds, +Inf implied)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+THROUGHPUT_WINDOW = 60.0      # Seconds of completions used for the current rate
+MAX_BODY_BYTES = 50 * 1024 * 1024
+DEFAULT_DEADLINE_MS = 30000
+# Accepted ?denoise= values: automatic, or force one tier (see preprocess.preprocess_image)
+DENOISE_MODES = ("auto",) + tuple(tier for _, tier in preprocess.DENOISE_TIERS) + ("nlm",)
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def prometheus(self, name, labels=""):
+        """Exposition lines (cumulative buckets, sum, count)."""
+        sep = "," if labels else ""
+        lines = []
+        running = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            running += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {running}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.3f}")
+        lines.append(f"{name}_count{suffix} {running}")
+        return lines
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.responses = {}  # HTTP status -> count
+        self.latency = Histogram()     # End-to-end, including queue wait
+        self.queue_wait = Histogram()
+        self.stages = {}               # Trace span name -> Histogram
+        self._completed = deque()      # Completion times within THROUGHPUT_WINDOW
+        self.completed_total = 0
+
+    def record_response(self, status):
+        with self._lock:
+            self.responses[status] = self.responses.get(status, 0) + 1
+
+    def record_job(self, wait_ms, total_ms, stage_totals):
+        now = time.monotonic()
+        with self._lock:
+            self.queue_wait.observe(wait_ms)
+            self.latency.observe(total_ms)
+            for name, ms in stage_totals.items():
+                self.stages.setdefault(name, Histogram()).observe(ms)
+            self.completed_total += 1
+            self._completed.append(now)
+            while self._completed and self._completed[0] < now - THROUGHPUT_WINDOW:
+                self._completed.popleft()
+
+    def throughput(self):
+        """Completed pages per second over the last THROUGHPUT_WINDOW seconds."""
+        now = time.monotonic()
+        with self._lock:
+            while self._completed and self._completed[0] < now - THROUGHPUT_WINDOW:
+                self._completed.popleft()
+            window = min(THROUGHPUT_WINDOW, max(1e-9, time.time() - self.started))
+            return len(self._completed) / window
+
+    def prometheus(self, queue_length, max_queue, busy_workers, workers):
+        throughput = self.throughput()
+        with self._lock:
+            lines = [
+                "# TYPE ocr_queue_length gauge", f"ocr_queue_length {queue_length}",
+                "# TYPE ocr_queue_capacity gauge", f"ocr_queue_capacity {max_queue}",
+                "# TYPE ocr_workers_busy gauge", f"ocr_workers_busy {busy_workers}",
+                "# TYPE ocr_workers gauge", f"ocr_workers {workers}",
+                "# TYPE ocr_uptime_seconds gauge", f"ocr_uptime_seconds {time.time() - self.started:.1f}",
+                "# TYPE ocr_pages_completed_total counter", f"ocr_pages_completed_total {self.completed_total}",
+                "# TYPE ocr_throughput_pages_per_second gauge",
+                f"ocr_throughput_pages_per_second {throughput:.3f}",
+                "# TYPE ocr_responses_total counter",
+            ]
+            lines += [f'ocr_responses_total{{code="{code}"}} {n}' for code, n in sorted(self.responses.items())]
+            rss = trace.peak_rss_mb()
+            if rss is not None:
+                lines += ["# TYPE ocr_peak_rss_bytes gauge", f"ocr_peak_rss_bytes {int(rss * 1024 * 1024)}"]
+            lines.append("# TYPE ocr_request_latency_ms histogram")
+            lines += self.latency.prometheus("ocr_request_latency_ms")
+            lines.append("# TYPE ocr_queue_wait_ms histogram")
+            lines += self.queue_wait.prometheus("ocr_queue_wait_ms")
+            lines.append("# TYPE ocr_stage_latency_ms histogram")
+            for name, hist in sorted(self.stages.items()):
+                lines += hist.prometheus("ocr_stage_latency_ms", f'stage="{name}"')
+        return "\n".join(lines) + "\n"
+
+class Job:
+    def __init__(self, image, options, deadline):
+        self.image = image
+        self.options = options
+        self.deadline = deadline    # time.monotonic() value
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.abandoned = False      # Caller stopped waiting (deadline hit)
+        self.result = None
+        self.error = None
+
+class QueueFull(Exception):
+    pass
+
+class ShuttingDown(Exception):
+    pass
+
+class OCRService:
+    """
+    Warm Recognizer + fixed worker threads fed by a bounded queue.
+    """
+    def __init__(self, recognizer, workers=None, max_queue=32, result_cache=None):
+        self.recognizer = recognizer
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.result_cache = result_cache
+        self.metrics = Metrics()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+        self.accepting = True
+        self._threads = [threading.Thread(target=self._worker, name=f"ocr-worker-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    def queue_length(self):
+        return self._queue.qsize()
+
+    def busy_workers(self):
+        return self._busy
+
+    def submit(self, image, options, deadline):
+        """Enqueue a page; raises QueueFull / ShuttingDown instead of blocking."""
+        if not self.accepting:
+            raise ShuttingDown()
+        job = Job(image, options, deadline)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise QueueFull()
+        return job
+
+    def _worker(self):
+        preprocessor = preprocess.Preprocessor()  # Buffers reused by this thread only
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                if job.abandoned or time.monotonic() >= job.deadline:
+                    # Nobody is waiting for this any more: skip the work
+                    job.error = TimeoutError("deadline exceeded while queued")
+                    continue
+                with self._busy_lock:
+                    self._busy += 1
+                started = time.monotonic()
+                try:
+                    result = pipeline.run_pipeline(self.recognizer, image_array=job.image,
+                                                   result_cache=self.result_cache, collect_trace=True,
+                                                   preprocessor=preprocessor, **job.options)
+                finally:
+                    with self._busy_lock:
+                        self._busy -= 1
+                spans = result.pop("trace")
+                stage_totals = {}
+                for s in spans:
+                    stage_totals[s["name"]] = stage_totals.get(s["name"], 0.0) + s["ms"]
+                finished = time.monotonic()
+                self.metrics.record_job((started - job.enqueued) * 1000, (finished - job.enqueued) * 1000,
+                                        stage_totals)
+                job.result = result
+            except Exception as e:
+                job.error = e
+            finally:
+                job.image = None
+                job.done.set()
+
+    def close(self, wait=True):
+        """Stop accepting work; queued jobs still run before workers exit."""
+        self.accepting = False
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+
+def _flag(params, name, default):
+    value = params.get(name, [None])[0]
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+class OCRRequestHandler(BaseHTTPRequestHandler):
+    service = None  # Set by make_server
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Access log to stderr only when asked for
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = (json.dumps(body, ensure_ascii=False) if content_type == "application/json"
+                    else body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.service.metrics.record_response(status)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        service = self.service
+        if path == "/healthz":
+            available = getattr(service.recognizer.backend, "is_available", lambda: True)()
+            ok = service.accepting and available
+            self._send(200 if ok else 503, {
+                "status": "ok" if ok else "unavailable",
+                "engine": service.recognizer.engine_name,
+                "workers": service.workers,
+                "queue_length": service.queue_length(),
+                "max_queue": service.max_queue,
+            })
+        elif path == "/metrics":
+            self._send(200, service.metrics.prometheus(service.queue_length(), service.max_queue,
+                                                       service.busy_workers(), service.workers),
+                       content_type="text/plain; version=0.0.4")
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/ocr":
+            self._send(404, {"error": "not found"})
+            return
+        params = parse_qs(url.query)
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self._send(400, {"error": "Content-Length must be an integer"})
+            self.close_connection = True
+            return
+        if length <= 0:
+            self._send(400, {"error": "empty body: send the image bytes"})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send(413, {"error": f"image larger than {MAX_BODY_BYTES} bytes"})
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+
+        try:
+            deadline_ms = float(params.get("deadline_ms", [self.server.default_deadline_ms])[0])
+        except ValueError:
+            self._send(400, {"error": "deadline_ms must be a number"})
+            return
+        deadline = time.monotonic() + deadline_ms / 1000.0
+
+        denoise_mode = params.get("denoise", ["auto"])[0]
+        if denoise_mode not in DENOISE_MODES:
+            self._send(400, {"error": f"denoise must be one of {', '.join(DENOISE_MODES)}"})
+            return
+
+        img = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            self._send(400, {"error": "could not decode image"})
+            return
+
+        options = {
+            "lang": params.get("lang", ["eng"])[0],
+            "safe_mode": _flag(params, "safe", True),
+            "denoise_mode": denoise_mode,
+            "tiled": _flag(params, "tiled", False),
+            "line_parallel": _flag(params, "lines", False),
+            "crop_regions": _flag(params, "regions", False),
+        }
+        try:
+            pipeline.check_recognition_mode(options["tiled"], options["line_parallel"], options["crop_regions"])
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+        try:
+            job = self.service.submit(img, options, deadline)
+        except QueueFull:
+            self._send(429, {"error": "queue full"}, headers={"Retry-After": "1"})
+            return
+        except ShuttingDown:
+            self._send(503, {"error": "shutting down"}, headers={"Retry-After": "5"})
+            return
+        del img
+
+        if not job.done.wait(max(0.0, deadline - time.monotonic())):
+            job.abandoned = True
+            self._send(504, {"error": "deadline exceeded"})
+            return
+        if isinstance(job.error, TimeoutError):
+            self._send(504, {"error": str(job.error)})
+        elif isinstance(job.error, ValueError):
+            self._send(400, {"error": str(job.error)})
+        elif job.error is not None:
+            self._send(500, {"error": str(job.error)})
+        else:
+            self._send(200, job.result)
+
+def make_server(service, host="127.0.0.1", port=8080, default_deadline_ms=DEFAULT_DEADLINE_MS, verbose=False):
+    handler = type("BoundOCRRequestHandler", (OCRRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.default_deadline_ms = default_deadline_ms
+    server.verbose = verbose
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.server", description="Local OCR HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="port (default: 8080)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="OCR worker threads (default: all cores)")
+    parser.add_argument("--max-queue", type=int, default=32,
+                        help="queued requests before answering 429 (default: 32)")
+    parser.add_argument("--deadline-ms", type=float, default=DEFAULT_DEADLINE_MS,
+                        help="default per-request deadline (default: 30000)")
+    parser.add_argument("--backend", default="tesseract", choices=sorted(recognize.BACKENDS) + ["auto"],
+                        help="recognition backend (default: tesseract)")
+    parser.add_argument("--cache-dir", default=None, help="persist results on disk (content-addressed)")
+    parser.add_argument("--verbose", action="store_true", help="log every request to stderr")
+    args = parser.parse_args(argv)
+
+    # The workers provide the parallelism: one thread per Tesseract/OpenCV call
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    cv2.setNumThreads(1)
+
+    with redirect_stdout(sys.stderr):
+        recognizer = recognize.Recognizer(backend=args.backend)
+    result_cache = cache.ResultCache(cache_dir=args.cache_dir) if args.cache_dir else None
+    service = OCRService(recognizer, workers=args.workers, max_queue=args.max_queue, result_cache=result_cache)
+    server = make_server(service, args.host, args.port, args.deadline_ms, args.verbose)
+    print(f"Serving OCR on http://{args.host}:{args.port} ({service.workers} workers, "
+          f"queue {service.max_queue})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.accepting = False
+        server.server_close()
+        service.close(wait=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
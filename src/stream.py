@@ -0,0 +1,93 @@
+"""
+Streaming OCR over multi-page documents with bounded memory.
+
+    for result in stream.ocr_document(recognizer, "bundle.tiff", prefetch=2):
+        print(result["page"], result["text"])
+
+Pages are decoded lazily (one frame at a time from multi-page TIFF/GIF, or
+one file at a time from a list/directory), at most `prefetch` pages are in
+flight, and results are yielded in page order as soon as they are ready.
+
+Usage:
+    python -m src.stream bundle.tiff [more.tiff scans/] [--prefetch 2] [--lang eng]
+"""
+import argparse
+import json
+import sys
+from contextlib import redirect_stdout
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from src import pipeline, recognize
+from src.prefetch import prefetch_map
+from src.batch import collect_inputs
+
+def _pil_to_bgr(frame):
+    rgb = np.asarray(frame.convert("RGB"))
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+def iter_pages(source):
+    """
+    Lazily decode pages.
+    Args:
+        source: a (possibly multi-page) image path, or an iterable of paths
+    Yields:
+        (path, frame_index, BGR numpy array), one page at a time
+    """
+    paths = [source] if isinstance(source, str) else source
+    for path in paths:
+        with Image.open(path) as im:
+            for i in range(getattr(im, "n_frames", 1)):
+                im.seek(i)
+                yield path, i, _pil_to_bgr(im)
+
+def ocr_document(recognizer, source, lang='eng', safe_mode=True, prefetch=2, **pipeline_options):
+    """
+    OCR every page of `source`, keeping at most `prefetch` pages in flight
+    (plus the one being decoded) in memory.
+    Args:
+        recognizer: a loaded recognize.Recognizer
+        source: see iter_pages
+        prefetch: pages decoded and processed concurrently
+        pipeline_options: passed to pipeline.run_pipeline (result_cache, tiled, ...)
+    Yields:
+        run_pipeline result dicts plus 'page' (0-based, across the whole
+        source), 'source' and 'frame', in page order
+    """
+    def run_page(numbered):
+        page_no, (path, frame, img) = numbered
+        result = pipeline.run_pipeline(recognizer, image_array=img, lang=lang, safe_mode=safe_mode,
+                                       **pipeline_options)
+        result.update(page=page_no, source=path, frame=frame)
+        return result
+
+    # Pages are decoded only when the window has room for another one
+    return prefetch_map(run_page, enumerate(iter_pages(source)), window=prefetch)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.stream", description="Streaming multi-page OCR.")
+    parser.add_argument("sources", nargs="+", help="multi-page TIFFs, images, directories or list files")
+    parser.add_argument("--prefetch", type=int, default=2, help="pages in flight (default: 2)")
+    parser.add_argument("--lang", default="eng", help="Tesseract language code (default: eng)")
+    parser.add_argument("--backend", default="tesseract", choices=sorted(recognize.BACKENDS) + ["auto"],
+                        help="recognition backend (default: tesseract)")
+    parser.add_argument("--unsafe", action="store_true", help="disable Safe Mode (aggressive demo fixes)")
+    args = parser.parse_args(argv)
+
+    paths = collect_inputs(args.sources)
+    if not paths:
+        print("No input images found.", file=sys.stderr)
+        return 1
+
+    # Keep stdout clean for JSON lines
+    with redirect_stdout(sys.stderr):
+        recognizer = recognize.Recognizer(backend=args.backend)
+    for result in ocr_document(recognizer, paths, lang=args.lang, safe_mode=not args.unsafe,
+                               prefetch=args.prefetch):
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
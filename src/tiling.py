@@ -0,0 +1,166 @@
+"""
+Tiled full-resolution OCR for large pages.
+
+Instead of scaling the whole page, the page is cut into horizontal strips at
+the gaps between text lines (found by segment.detect_lines on a cheap
+thumbnail), each strip is preprocessed and recognized at full resolution on a
+thread pool, and the strip texts are stitched back with duplicate lines from
+the overlaps removed. Peak memory is bounded by strip size x workers.
+"""
+import contextvars
+import difflib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from src import preprocess, segment, trace
+
+STRIP_HEIGHT = 1024   # Target strip height in full-resolution pixels
+STRIP_OVERLAP = 48    # Extra rows around a cut (less when cutting in a narrow gap)
+LAYOUT_WIDTH = 800    # Thumbnail width used to find line positions
+
+def _thumbnail_layout(img):
+    """
+    Line boxes and skew for the page, measured on a LAYOUT_WIDTH thumbnail.
+    Returns:
+        line_boxes: (x, y, w, h) tuples in full-resolution coordinates
+        angle, confidence: page skew estimate (see preprocess.estimate_skew)
+    """
+    h, w = img.shape[:2]
+    scale = min(1.0, LAYOUT_WIDTH / float(w))
+    thumb = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    binary = preprocess.binarize(preprocess.to_grayscale(thumb))
+    angle, confidence = preprocess.estimate_skew(binary)
+    if abs(angle) > 0.5 and confidence >= preprocess.DESKEW_MIN_CONFIDENCE:
+        binary = preprocess.rotate_image(binary, angle)
+    boxes = [tuple(int(round(v / scale)) for v in box) for box in segment.detect_lines(binary)]
+    return boxes, angle, confidence
+
+def plan_strips(line_boxes, page_height, strip_height=STRIP_HEIGHT, overlap=STRIP_OVERLAP):
+    """
+    Choose horizontal strips covering the page, cutting between text lines.
+    Args:
+        line_boxes: (x, y, w, h) line boxes in page coordinates
+        page_height: page height in pixels
+    Returns:
+        strips: list of (y0, y1) row ranges, overlapping around each cut
+        hard_cuts: one bool per boundary between consecutive strips, True
+                   where the cut goes through text (the strips then share
+                   the overlap rows); cuts in a gap share no text
+    """
+    if page_height <= strip_height:
+        return [(0, page_height)], []
+
+    # Merge line boxes into vertical text bands; cut in the gaps between them
+    bands = []
+    for y0, y1 in sorted((y, y + h) for _, y, _, h in line_boxes):
+        if bands and y0 <= bands[-1][1]:
+            bands[-1][1] = max(bands[-1][1], y1)
+        else:
+            bands.append([y0, y1])
+    gaps = [(a[1], b[0]) for a, b in zip(bands, bands[1:])]
+
+    cuts = []  # (row, margin)
+    hard_cuts = []
+    start = 0
+    while page_height - start > strip_height:
+        limit = start + strip_height
+        # Latest gap that still makes at least half a strip of progress
+        candidates = [g for g in gaps if start + strip_height // 2 < (g[0] + g[1]) // 2 <= limit]
+        if candidates:
+            g0, g1 = candidates[-1]
+            cut, margin, hard = (g0 + g1) // 2, min(overlap, (g1 - g0) // 2), False
+        else:
+            # No gap: hard cut through text, the overlap covers the split line
+            cut, margin, hard = limit, overlap, True
+        cuts.append((cut, margin))
+        hard_cuts.append(hard)
+        start = cut
+
+    bounds = [(0, 0)] + cuts + [(page_height, 0)]
+    strips = [(max(0, a - ma), min(page_height, b + mb)) for (a, ma), (b, mb) in zip(bounds, bounds[1:])]
+    return strips, hard_cuts
+
+def _normalize_line(line):
+    return " ".join(line.split()).lower()
+
+def stitch_texts(texts, hard_cuts=None, max_overlap_lines=3, min_ratio=0.8):
+    """
+    Join strip texts top to bottom. After a hard cut (see plan_strips),
+    leading lines of a strip that repeat (fuzzily) the last lines of the
+    previous one are dropped; strips cut in a gap are joined as they are,
+    so genuinely repeated lines (table rows, rules) survive.
+    Args:
+        hard_cuts: one bool per strip boundary (None: treat all as hard)
+    """
+    out = []
+    for i, text in enumerate(texts):
+        lines = [l for l in text.splitlines()]
+        skip = 0
+        overlapping = i > 0 and (hard_cuts is None or hard_cuts[i - 1])
+        for k in range(min(max_overlap_lines, len(out), len(lines)) if overlapping else 0, 0, -1):
+            tail = [_normalize_line(l) for l in out[-k:]]
+            head = [_normalize_line(l) for l in lines[:k]]
+            if all(difflib.SequenceMatcher(None, a, b).ratio() >= min_ratio for a, b in zip(tail, head)):
+                skip = k
+                break
+        out.extend(lines[skip:])
+    return "\n".join(out).strip()
+
+def recognize_tiled(recognizer, image_path=None, image_array=None, lang='eng', denoise_mode="auto",
+                    strip_height=STRIP_HEIGHT, overlap=STRIP_OVERLAP, workers=None):
+    """
+    Full-resolution OCR of a large page, strip by strip.
+    Returns:
+        text: stitched layout text
+        confidence: character-weighted mean confidence of the strips
+        info: dict with skew, strip bounds and per-strip preprocess info
+    """
+    if image_array is not None:
+        img = image_array
+    elif image_path:
+        img = cv2.imread(image_path)
+    else:
+        raise ValueError("No image provided")
+    if img is None:
+        raise ValueError("Could not load image")
+
+    with trace.span("tiling.layout", img):
+        line_boxes, angle, confidence = _thumbnail_layout(img)
+    deskewed = abs(angle) > 0.5 and confidence >= preprocess.DESKEW_MIN_CONFIDENCE
+    if deskewed:
+        # Rotate once at full resolution; strips then skip deskew
+        with trace.span("tiling.rotate_page", img, angle=angle):
+            img = preprocess.rotate_image(img, angle)
+
+    strips, hard_cuts = plan_strips(line_boxes, img.shape[0], strip_height, overlap)
+
+    def run_strip(bounds):
+        y0, y1 = bounds
+        with trace.span("tiling.strip", None, rows=[y0, y1]):
+            binary, _, strip_info = preprocess.preprocess_image(
+                image_array=img[y0:y1], denoise_mode=denoise_mode, return_info=True,
+                max_width=None, deskew=False)
+            text, conf = recognizer.extract_text_with_layout(binary, lang=lang)
+        return text, conf, strip_info
+
+    workers = workers or min(len(strips), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Copy the context so spans from worker threads land in the caller's trace
+        futures = [pool.submit(contextvars.copy_context().run, run_strip, b) for b in strips]
+        results = [f.result() for f in futures]
+
+    texts = [r[0] for r in results]
+    weights = [max(1, len(t)) for t in texts]
+    avg_confidence = sum(r[1] * w for r, w in zip(results, weights)) / sum(weights)
+    info = {
+        "tiled": True,
+        "skew_angle": angle,
+        "skew_confidence": confidence,
+        "deskewed": deskewed,
+        "strips": [list(b) for b in strips],
+        "hard_cuts": hard_cuts,
+        "strip_preprocess": [r[2] for r in results],
+    }
+    return stitch_texts(texts, hard_cuts), avg_confidence, info
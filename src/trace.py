@@ -0,0 +1,124 @@
+"""
+Lightweight per-stage timing trace.
+
+    with trace.tracing() as tr:
+        preprocess.preprocess_image(path)
+    print(tr.format_breakdown())
+
+Instrumented code calls `with trace.span("stage", image, key=value):`. When no
+trace is active, span() returns a shared no-op context manager, so the cost
+is one ContextVar lookup per stage.
+"""
+import contextvars
+import sys
+import time
+from contextlib import contextmanager
+
+_active = contextvars.ContextVar("ocr_trace", default=None)
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **params):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+def _size_of(value):
+    """Input size for the record: array shape, or length of text."""
+    if value is None:
+        return None
+    shape = getattr(value, "shape", None)
+    if shape is not None:
+        return list(shape)
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+class Span:
+    def __init__(self, trace, name, size, params):
+        self.trace = trace
+        self.name = name
+        self.size = size
+        self.params = params
+        self.start = None
+
+    def set(self, **params):
+        """Attach parameters only known once the stage has run."""
+        self.params.update(params)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.start, self.size, self.params)
+        return False
+
+class Trace:
+    def __init__(self):
+        self.spans = []
+
+    def add(self, name, seconds, size=None, params=None):
+        self.spans.append({
+            "name": name,
+            "ms": seconds * 1000,
+            "size": size,
+            "params": params or {},
+        })
+
+    def to_list(self):
+        return list(self.spans)
+
+    def totals(self):
+        """Total milliseconds per span name, in first-seen order."""
+        totals = {}
+        for s in self.spans:
+            totals[s["name"]] = totals.get(s["name"], 0.0) + s["ms"]
+        return totals
+
+    def format_breakdown(self):
+        totals = self.totals()
+        if not totals:
+            return ""
+        width = max(len(name) for name in totals)
+        return "\n".join(f"{name:<{width}}  {ms:8.1f} ms" for name, ms in totals.items())
+
+@contextmanager
+def tracing(trace=None):
+    """Collect spans from everything run inside this block (same thread/task)."""
+    trace = trace if trace is not None else Trace()
+    token = _active.set(trace)
+    try:
+        yield trace
+    finally:
+        _active.reset(token)
+
+def current():
+    """The active Trace, or None when tracing is off."""
+    return _active.get()
+
+def span(name, data=None, **params):
+    """Time a stage into the active trace; no-op when tracing is off."""
+    trace = _active.get()
+    if trace is None:
+        return _NULL_SPAN
+    return Span(trace, name, _size_of(data), params)
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident set size in MB of this process, or of its terminated
+    child processes (e.g. pool workers). None where unsupported (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    return usage.ru_maxrss / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0)
@@ -2,14 +2,13 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 from PIL import Image, ImageTk
 import threading
-import cv2
 import os
 import sys
 
 # Add src to path if needed (though running from root usually works)
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
-from src import preprocess, segment, recognize, postprocess
+from src import recognize, postprocess, pipeline, cache, trace
 from src.premium_style import PremiumButton, GlassPanel, create_divider
 
 class OCRApp:
@@ -53,6 +52,10 @@ class OCRApp:
         self.current_image_path = None
         self.current_cv_image = None
         self.recognizer = recognize.Recognizer()
+        self.result_cache = cache.ResultCache(cache_dir=cache.DEFAULT_CACHE_DIR)
+        # Keeps decoded/binary/raw OCR artifacts so re-extracting after a
+        # language or Safe Mode change skips the stages that didn't change
+        self.staged = pipeline.StagedPipeline(self.recognizer)
         
         # EXPANDED LANGUAGE OPTIONS (25+ languages for judges)
         self.language_options = {
@@ -370,9 +373,10 @@ class OCRApp:
             self.txt_output.delete("1.0", tk.END)
             self.txt_debug.delete("1.0", tk.END)
 
-    def load_image_preview(self, path, is_original=True):
+    def load_image_preview(self, source, is_original=True):
+        """source: image path, or a numpy array (e.g. the binary page) shown without touching disk."""
         try:
-            image = Image.open(path)
+            image = Image.open(source) if isinstance(source, str) else Image.fromarray(source)
             # Resize logic to fit 300x400 approx
             image.thumbnail((300, 400)) 
             tk_image = ImageTk.PhotoImage(image)
@@ -437,26 +441,17 @@ class OCRApp:
              self.pipeline_steps[step_idx].config(fg=self.primary, bg=self.bg_dark, font=("Segoe UI", 9, "bold"))
 
     def process_image(self):
+        # Collect a per-stage timing breakdown for the debug tab
+        with trace.tracing():
+            self._process_image()
+
+    def _process_image(self):
         import time
         start_time = time.time()
         try:
             safe_mode = self.safe_mode_var.get()
             honest_mode = self.honesty_var.get()
             
-            # Step 1: Cleaning
-            self.highlight_step(0)
-            self.update_status("Step 1: Cleaning Image...")
-            binary, original = preprocess.preprocess_image(self.current_image_path)
-            
-            # Save and Show Debug Vision (preprocessed image)
-            cv2.imwrite("debug_segmentation.png", binary)
-            self.update_preview_vision("debug_segmentation.png")
-            
-            # Step 2 & 3: Tesseract Recognition (handles detection + recognition)
-            self.highlight_step(1)
-            self.update_status("Step 2-3: Tesseract OCR Processing...")
-            
-            
             # Get selected language (check for custom input)
             selected_lang_name = self.language_var.get()
             
@@ -468,15 +463,50 @@ class OCRApp:
             else:
                 lang_code = self.language_options.get(selected_lang_name, "eng")
             
+            # Step 0: Result cache (same image + same settings = same output)
+            cache_key = pipeline.cache_key(self.recognizer, self.current_image_path,
+                                           lang=lang_code, safe_mode=safe_mode)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.update_status("Cached result")
+                self.finish_cached(cached, time_taken=time.time()-start_time)
+                return
+            
+            # Step 1: Cleaning (reused when only language/Safe Mode changed)
+            self.highlight_step(0)
+            self.update_status("Step 1: Cleaning Image...")
+            
+            # Blank pages / photos without text skip the whole pipeline
+            no_text, text_check = self.staged.check_text(self.current_image_path)
+            if no_text is not None:
+                result = pipeline.no_text_result(no_text, text_check)
+                self.result_cache.put(cache_key, result)
+                self.finish_cached(result, time_taken=time.time()-start_time)
+                return
+            
+            binary, original, preprocess_info = self.staged.preprocess(self.current_image_path)
+            
+            # Show Debug Vision (preprocessed image, straight from memory)
+            self.update_preview_vision(binary)
+            
+            # Step 2 & 3: Tesseract Recognition (handles detection + recognition)
+            self.highlight_step(1)
+            self.update_status("Step 2-3: Tesseract OCR Processing...")
+            
             # Use Tesseract to extract text directly from preprocessed image
-            extracted_text, confidence = self.recognizer.extract_text_with_layout(binary, lang=lang_code)
+            extracted_text, confidence = self.staged.recognize(self.current_image_path, lang=lang_code)
+            
+            result = {"text": "", "raw_text": extracted_text, "confidence": confidence,
+                      "preprocess": preprocess_info}
             
             if not extracted_text:
+                self.result_cache.put(cache_key, result)
                 self.finish_processing("No text detected.", "", success=False, time_taken=time.time()-start_time)
                 return
             
             raw_text = extracted_text
-            debug_text = f"Average Confidence: {confidence:.2%}\n\n{extracted_text}"
+            debug_text = (f"Average Confidence: {confidence:.2%}\n"
+                          f"Denoise: {preprocess_info['denoise_tier']}\n\n{extracted_text}")
             
             # (Tesseract handles all recognition - no character loop needed)
                 
@@ -488,21 +518,40 @@ class OCRApp:
             corrected_text = postprocess.fix_ocr_errors(raw_text)
             
             # Then apply additional cleaning
-            safe_mode = self.safe_mode_var.get()
             final_text = postprocess.clean_text(corrected_text, safe_mode=safe_mode)
             
+            result["text"] = final_text
+            self.result_cache.put(cache_key, result)
+            
             self.finish_processing(final_text, debug_text, success=True, time_taken=time.time()-start_time)
             
         except Exception as e:
             self.finish_processing(f"Error: {str(e)}", "", success=False, time_taken=time.time()-start_time)
 
-    def update_preview_vision(self, path):
-        self.root.after(0, lambda: self.load_image_preview(path, is_original=False))
+    def finish_cached(self, result, time_taken):
+        if result.get("no_text"):
+            self.finish_processing("No text detected.", f"Skipped: {result['no_text']}",
+                                   success=False, time_taken=time_taken)
+            return
+        if not result["raw_text"]:
+            self.finish_processing("No text detected.", "", success=False, time_taken=time_taken)
+            return
+        stats = self.result_cache.stats()
+        debug_text = (f"Average Confidence: {result['confidence']:.2%}\n"
+                      f"Denoise: {result['preprocess']['denoise_tier']}\n"
+                      f"Cache: hit ({stats['hits']} hits / {stats['misses']} misses)\n\n{result['raw_text']}")
+        self.finish_processing(result["text"], debug_text, success=True, time_taken=time_taken)
+
+    def update_preview_vision(self, source):
+        self.root.after(0, lambda: self.load_image_preview(source, is_original=False))
 
     def update_status(self, text):
         self.root.after(0, lambda: self.lbl_status.config(text=text))
 
     def finish_processing(self, text, debug_text, success, time_taken):
+        tr = trace.current()
+        if tr is not None and tr.spans:
+            debug_text = f"Stage breakdown:\n{tr.format_breakdown()}\n\n{debug_text}"
         self.root.after(0, lambda: self._update_ui_finished(text, debug_text, success, time_taken))
         
     def _update_ui_finished(self, text, debug_text, success, time_taken):
@@ -1,19 +1,39 @@
+import argparse
+import json
+import multiprocessing as mp
 import os
 import pickle
+import random
+import threading
 import numpy as np
 import string
 import glob
+import itertools
 from PIL import Image, ImageDraw, ImageFont
 from sklearn.neural_network import MLPClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
 import cv2
 
+from src.prefetch import prefetch_map
+
 # Config
 DATA_DIR = "data"
 MODEL_PATH = os.path.join(DATA_DIR, "char_model.pkl")
+SHARD_DIR = os.path.join(DATA_DIR, "shards")
 IMG_SIZE = 28  
+RENDER_SIZE = 48  # Canvas glyphs are drawn and augmented on
 SAMPLES_PER_CHAR = 100 # Balanced for speed/quality
+MAX_FONTS = 60
+CHARS = string.ascii_uppercase + string.digits + " .,"
+FONT_SIZE = 32
+
+# Streaming training (partial_fit on augmented mini-batches)
+CHECKPOINT_PATH = os.path.join(DATA_DIR, "char_model.ckpt")
+STREAM_BATCH = 256
+STREAM_EPOCHS = 20        # Default length, in passes over a SAMPLES_PER_CHAR-sized dataset
+CHECKPOINT_EVERY = 200    # Batches between validation + checkpoint
+VALIDATION_BATCHES = 20   # Held-out batches (their own seed stream)
+PATIENCE = 10             # Checkpoints without validation improvement before stopping
+SHARD_HOLDOUT = 0.02      # Fraction of each exported shard held out (--from-shards)
 
 def get_system_fonts():
     """Scans Windows font directory for TTF files."""
@@ -26,38 +46,89 @@ def get_system_fonts():
     valid_fonts = [f for f in fonts if "wingding" not in f.lower() and "symbol" not in f.lower()]
     return valid_fonts
 
-def apply_augmentation(img_np):
+def augment_batch(stack, rng):
     """
-    Apply realistic destructive noise (like a bad screenshot).
+    Apply realistic destructive noise (like a bad screenshot) to a whole
+    (B, 48, 48) uint8 stack at once; every sample draws its own parameters.
     """
-    h, w = img_np.shape[:2]
-    
+    n, h, w = stack.shape
+
     # 1. Random Rotation (-5 to +5)
-    angle = np.random.uniform(-5, 5)
-    M = cv2.getRotationMatrix2D((w/2, h/2), angle, 1.0)
-    img_np = cv2.warpAffine(img_np, M, (w, h), flags=cv2.INTER_LINEAR, borderValue=0)
-    
+    stack = rotate_batch(stack, rng.uniform(-5, 5, n))
+
     # 2. Blur (Simulate out of focus)
-    if np.random.rand() > 0.5:
-        k = np.random.choice([3, 5])
-        img_np = cv2.GaussianBlur(img_np, (k, k), 0)
-        
-    # 3. Erosion/Dilation (Simulate ink spread or fade)
-    if np.random.rand() > 0.5:
-        kernel = np.ones((2,2), np.uint8)
-        if np.random.rand() > 0.5:
-            img_np = cv2.erode(img_np, kernel, iterations=1)
-        else:
-            img_np = cv2.dilate(img_np, kernel, iterations=1)
-            
+    blur = rng.random(n) > 0.5
+    ksize = rng.choice([3, 5], n)
+    for k in (3, 5):
+        sel = np.flatnonzero(blur & (ksize == k))
+        if len(sel):
+            stack[sel] = gaussian_blur_batch(stack[sel], k)
+
+    # 3. Erosion/Dilation (Simulate ink spread or fade), 2x2 kernel
+    morph = rng.random(n) > 0.5
+    erode = rng.random(n) > 0.5
+    for sel, fn, border in ((morph & erode, np.minimum, 255), (morph & ~erode, np.maximum, 0)):
+        sel = np.flatnonzero(sel)
+        if len(sel):
+            # cv2 anchors a 2x2 kernel at (1, 1): each pixel sees itself, up and left
+            p = np.pad(stack[sel], ((0, 0), (1, 0), (1, 0)), constant_values=border)
+            stack[sel] = fn(fn(p[:, :-1, :-1], p[:, :-1, 1:]), fn(p[:, 1:, :-1], p[:, 1:, 1:]))
+
     # 4. Salt and Pepper Noise
-    if np.random.rand() > 0.3:
-        noise = np.random.randint(0, 50, img_np.shape)
-        img_np = cv2.add(img_np, noise.astype(np.uint8))
-        
-    return img_np
+    sel = np.flatnonzero(rng.random(n) > 0.3)
+    if len(sel):
+        noise = rng.integers(0, 50, (len(sel), h, w), dtype=np.uint8)
+        # Saturating add, as one 2D cv2 call over the stacked rows
+        stack[sel] = cv2.add(stack[sel].reshape(-1, w), noise.reshape(-1, w)).reshape(-1, h, w)
+
+    return stack
 
-def resize_and_pad_high_res(roi):
+ROTATE_CHUNK = 512  # Samples per cv2.remap call (OpenCV caps remap images at 32767 rows)
+
+def rotate_batch(stack, angles):
+    """
+    Per-sample rotation about the center, same as cv2.warpAffine with
+    INTER_LINEAR and a black border, for a whole stack.
+    The stack is tiled into one tall image (a black row under each sample)
+    and rotated by a single cv2.remap per chunk.
+    """
+    n, h, w = stack.shape
+    tile_h = h + 1
+    rad = np.deg2rad(angles).astype(np.float32)[:, None, None]
+    cos, sin = np.cos(rad), np.sin(rad)
+    cx, cy = w / 2.0, h / 2.0
+    ys, xs = np.mgrid[0:h, 0:w].astype(np.float32)
+    xs, ys = xs - cx, ys - cy
+    # Inverse map: where each output pixel samples the source
+    map_x = cos * xs - sin * ys + cx
+    map_y = sin * xs + cos * ys + cy
+    # Taps above/below a sample must not reach its neighbours: send them off the image
+    outside = (map_y <= -1) | (map_y >= h)
+
+    out = np.empty_like(stack)
+    for start in range(0, n, ROTATE_CHUNK):
+        end = min(n, start + ROTATE_CHUNK)
+        tiles = np.zeros((end - start, tile_h, w), dtype=np.uint8)
+        tiles[:, :h] = stack[start:end]
+        offsets = (np.arange(end - start, dtype=np.float32) * tile_h)[:, None, None]
+        my = np.where(outside[start:end], np.float32(-2), map_y[start:end] + offsets)
+        rotated = cv2.remap(tiles.reshape(-1, w), map_x[start:end].reshape(-1, w), my.reshape(-1, w),
+                            cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        out[start:end] = rotated.reshape(-1, h, w)
+    return out
+
+def gaussian_blur_batch(stack, k):
+    """cv2.GaussianBlur(img, (k, k), 0) on every image of the stack (separable, reflect-101 border)."""
+    kernel = cv2.getGaussianKernel(k, 0).ravel().astype(np.float32)
+    r = k // 2
+    # numpy 'reflect' is OpenCV's default BORDER_REFLECT_101
+    p = np.pad(stack, ((0, 0), (r, r), (r, r)), mode="reflect").astype(np.float32)
+    h, w = stack.shape[1:]
+    rows = sum(kernel[i] * p[:, i:i + h, :] for i in range(k))
+    out = sum(kernel[i] * rows[:, :, i:i + w] for i in range(k))
+    return np.rint(out).astype(np.uint8)
+
+def resize_and_pad_high_res(roi, out=None):
     h, w = roi.shape[:2]
     if h == 0 or w == 0: return None
     
@@ -68,119 +139,395 @@ def resize_and_pad_high_res(roi):
     
     resized = cv2.resize(roi, (new_w, new_h), interpolation=cv2.INTER_AREA)
     
-    canvas = np.zeros((IMG_SIZE, IMG_SIZE), dtype="uint8")
+    canvas = np.zeros((IMG_SIZE, IMG_SIZE), dtype="uint8") if out is None else out
     x_off = (IMG_SIZE - new_w) // 2
     y_off = (IMG_SIZE - new_h) // 2
     canvas[y_off:y_off+new_h, x_off:x_off+new_w] = resized
     
     return canvas
 
-def generate_data():
-    print("Finding system fonts...")
-    font_paths = get_system_fonts()
-    print(f"Found {len(font_paths)} fonts.")
+def render_glyph(font, char):
+    """Draw one character roughly centered on a black RENDER_SIZE canvas."""
+    img = Image.new('L', (RENDER_SIZE, RENDER_SIZE), color=0)
+    draw = ImageDraw.Draw(img)
+    try: w, h = draw.textsize(char, font=font)
+    except: 
+        bbox = draw.textbbox((0,0), char, font=font)
+        w, h = bbox[2], bbox[3]
     
-    # Load fonts (limit to 60 to keep generation time reasonable, priority to standard ones)
+    # Center roughly
+    draw.text(((RENDER_SIZE-w)//2, (RENDER_SIZE-h)//2), char, font=font, fill=255)
+    return np.array(img)
+
+def load_font(path, size=FONT_SIZE):
+    try: return ImageFont.truetype(path, size)
+    except: return None
+
+class GlyphCache:
+    """
+    Rendered glyphs keyed by (font path, char, size). Every augmented sample
+    starts from a cached render, so each glyph is drawn once per run; the
+    cache holds fonts x chars small images, however many samples are made.
+    Thread-safe (FreeType faces are not).
+    """
+    def __init__(self):
+        self._fonts = {}
+        self._glyphs = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._glyphs)
+
+    def get(self, font_path, char, size=FONT_SIZE):
+        key = (font_path, char, size)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            with self._lock:
+                glyph = self._glyphs.get(key)
+                if glyph is None:
+                    if (font_path, size) not in self._fonts:
+                        self._fonts[(font_path, size)] = load_font(font_path, size)
+                    glyph = render_glyph(self._fonts[(font_path, size)], char)
+                    self._glyphs[key] = glyph
+        return glyph
+
+    def stack(self, pairs, size=FONT_SIZE):
+        """(B, 48, 48) copy of the glyphs for a sequence of (font_path, char)."""
+        return np.stack([self.get(font_path, char, size) for font_path, char in pairs])
+
+def crop_boxes(stack):
+    """
+    Tight ink box of every sample in an augmented stack.
+    Returns:
+        keep: indices of samples with ink (all-black ones have no box)
+        boxes: (top, bottom, left, right) arrays over the whole stack
+    """
+    rows = stack.any(axis=2)
+    cols = stack.any(axis=1)
+    keep = np.flatnonzero(rows.any(axis=1))
+    top, left = rows.argmax(axis=1), cols.argmax(axis=1)
+    bottom = stack.shape[1] - rows[:, ::-1].argmax(axis=1)
+    right = stack.shape[2] - cols[:, ::-1].argmax(axis=1)
+    return keep, (top, bottom, left, right)
+
+def normalize_crops(stack, keep, boxes, out):
+    """Crop the kept samples to their boxes and resize_and_pad_high_res each into a row of out (K, 784) uint8."""
+    top, bottom, left, right = boxes
+    canvases = out.reshape(len(keep), IMG_SIZE, IMG_SIZE)
+    canvases[:] = 0
+    for row, i in enumerate(keep):
+        resize_and_pad_high_res(stack[i, top[i]:bottom[i], left[i]:right[i]], out=canvases[row])
+    return out
+
+def select_fonts(font_paths, seed=0):
+    """Priority fonts first, then a seeded random fill up to MAX_FONTS (paths only)."""
     priority_fonts = ["arial", "times", "segoe", "calibri", "verdana", "tahoma", "comic"]
-    
-    selected_fonts = []
-    
-    def load_font(path):
-        try: return ImageFont.truetype(path, 32)
-        except: return None
+    selected = []
 
     # Load priority first
     for p in priority_fonts:
         for f in font_paths:
-            if p in f.lower():
-                ft = load_font(f)
-                if ft: selected_fonts.append(ft)
-                
+            if p in f.lower() and load_font(f):
+                selected.append(f)
+
     # Fill rest with random
-    import random
-    random.shuffle(font_paths)
+    font_paths = list(font_paths)
+    random.Random(seed).shuffle(font_paths)
     for f in font_paths:
-        if len(selected_fonts) > 60: break
-        ft = load_font(f)
-        if ft: selected_fonts.append(ft)
-        
-    print(f"Generating data using {len(selected_fonts)} fonts...")
+        if len(selected) > MAX_FONTS: break
+        if load_font(f):
+            selected.append(f)
+    return selected
+
+_glyph_cache = GlyphCache()  # Per process
+
+def _init_worker():
+    # The pool provides the parallelism: one OpenCV thread per process
+    cv2.setNumThreads(1)
+
+def generate_shard(task):
+    """
+    Worker: every (char x sample) of one font, written as one shard.
+    Each glyph is rendered once and augmented as a (B, 48, 48) stack.
+    Args:
+        task: (index, font_path, out_dir, seed_sequence)
+    Returns:
+        shard: dict with font, X/y file names and sample count
+    """
+    index, font_path, out_dir, seed = task
+    rng = np.random.default_rng(seed)
+
+    glyphs = _glyph_cache.stack([(font_path, char) for char in CHARS])
+    stack = augment_batch(np.repeat(glyphs, SAMPLES_PER_CHAR, axis=0), rng)
+    labels = np.repeat(np.arange(len(CHARS), dtype=np.uint8), SAMPLES_PER_CHAR)
+
+    # Find tight boxes (all-black samples have none and are dropped)
+    keep, boxes = crop_boxes(stack)
+
+    x_name, y_name = f"X_{index:05d}.npy", f"y_{index:05d}.npy"
+    # Normalize straight into the memory-mapped shard, one 28x28 row per sample
+    X = np.lib.format.open_memmap(os.path.join(out_dir, x_name), mode="w+", dtype=np.uint8,
+                                  shape=(len(keep), IMG_SIZE * IMG_SIZE))
+    normalize_crops(stack, keep, boxes, X.view(np.ndarray))
+    X.flush()
+    del X
+
+    y = np.lib.format.open_memmap(os.path.join(out_dir, y_name), mode="w+", dtype=np.uint8,
+                                  shape=(len(keep),))
+    y[:] = labels[keep]
+    y.flush()
+    del y
+
+    return {"index": index, "font": font_path, "X": x_name, "y": y_name, "count": int(len(keep))}
+
+def generate_data(out_dir=SHARD_DIR, workers=None, seed=0):
+    """
+    Render the synthetic training set as .npy shards, one font per shard,
+    on a process pool.
+    Shards hold uint8 pixels (N, 784) and uint8 indices into CHARS (N,);
+    manifest.json lists them. Each shard gets its own child of `seed`, so
+    the output does not depend on the worker count or scheduling.
+    Returns:
+        manifest: dict with chars, img_size, seed and the shard list
+    """
+    print("Finding system fonts...")
+    font_paths = get_system_fonts()
+    print(f"Found {len(font_paths)} fonts.")
     
-    chars = string.ascii_uppercase + string.digits + " .,"
-    X = []
-    y = []
+    # Limit to 60 fonts to keep generation time reasonable, priority to standard ones
+    selected_fonts = select_fonts(font_paths, seed)
+    print(f"Generating data using {len(selected_fonts)} fonts...")
     
-    count = 0
-    total_samples = len(chars) * len(selected_fonts) * SAMPLES_PER_CHAR
+    total_samples = len(CHARS) * len(selected_fonts) * SAMPLES_PER_CHAR
     print(f"Targeting ~{total_samples} samples.")
 
-    for char in chars:
-        for font in selected_fonts:
-            for _ in range(SAMPLES_PER_CHAR):
-                img = Image.new('L', (48, 48), color=0)
-                draw = ImageDraw.Draw(img)
-                try: w, h = draw.textsize(char, font=font)
-                except: 
-                    bbox = draw.textbbox((0,0), char, font=font)
-                    w, h = bbox[2], bbox[3]
-                
-                # Center roughly
-                draw.text(((48-w)//2, (48-h)//2), char, font=font, fill=255)
-                
-                img_np = np.array(img)
-                
-                # Augment!
-                img_np = apply_augmentation(img_np)
-                
-                # Find tight box
-                coords = cv2.findNonZero(img_np)
-                if coords is not None:
-                    bx, by, bw, bh = cv2.boundingRect(coords)
-                    roi = img_np[by:by+bh, bx:bx+bw]
-                    processed = resize_and_pad_high_res(roi)
-                    if processed is not None:
-                        X.append(processed.flatten() / 255.0)
-                        y.append(char)
-                        count += 1
-                        if count % 5000 == 0:
-                            print(f"Generated {count} samples...")
-
-    return np.array(X), np.array(y)
-
-def train():
+    os.makedirs(out_dir, exist_ok=True)
+    seeds = np.random.SeedSequence(seed).spawn(len(selected_fonts))
+    tasks = [(i, f, out_dir, s) for i, (f, s) in enumerate(zip(selected_fonts, seeds))]
+
+    shards = []
+    count = 0
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+    with mp.Pool(workers, initializer=_init_worker) as pool:
+        for shard in pool.imap_unordered(generate_shard, tasks):
+            shards.append(shard)
+            count += shard["count"]
+            print(f"Generated {count} samples ({len(shards)}/{len(tasks)} shards)...")
+
+    shards.sort(key=lambda s: s["index"])
+    manifest = {"chars": CHARS, "img_size": IMG_SIZE, "seed": seed, "shards": shards}
+    # Written last: a directory without a manifest is an interrupted run
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+def open_shards(out_dir=SHARD_DIR):
+    """
+    Shards listed in out_dir/manifest.json, memory-mapped (nothing is read yet).
+    Returns:
+        manifest: the manifest dict
+        shards: list of (X, y) read-only memmaps, X (N, 784) uint8, y (N,) uint8
+    """
+    with open(os.path.join(out_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest["chars"] != CHARS or manifest["img_size"] != IMG_SIZE:
+        raise ValueError(f"{out_dir} was exported for other characters/glyph size; export it again")
+    shards = [(np.load(os.path.join(out_dir, s["X"]), mmap_mode="r"),
+               np.load(os.path.join(out_dir, s["y"]), mmap_mode="r")) for s in manifest["shards"]]
+    return manifest, shards
+
+def split_shards(shards, seed=0, holdout=SHARD_HOLDOUT):
+    """Per shard, a seeded (train_rows, held_out_rows) split of its row indices."""
+    splits = []
+    for k, (_, y) in enumerate(shards):
+        rows = np.random.default_rng([seed, 1, k]).permutation(len(y))
+        n_held = max(1, int(len(y) * holdout))
+        splits.append((np.sort(rows[n_held:]), np.sort(rows[:n_held])))
+    return splits
+
+def shard_held_out(shards, splits):
+    """The held-out rows of every shard as one (X float32 in [0, 1], y) set."""
+    X = np.concatenate([X[held] for (X, _), (_, held) in zip(shards, splits)])
+    y = np.concatenate([y[held] for (_, y), (_, held) in zip(shards, splits)])
+    return X.astype(np.float32) * np.float32(1.0 / 255.0), y
+
+def shard_batches(shards, splits, seed=0, start=0, stop=None, batch_size=STREAM_BATCH):
+    """
+    Shuffled passes over the training rows of exported shards, read through
+    the memmaps one mini-batch at a time. Each pass visits the shards in a
+    seeded order and each shard's rows in a seeded order, so batch `index`
+    depends only on (seed, index) and a resumed run continues exactly.
+    Yields:
+        (index, X, y): X (K, 784) float32 in [0, 1], y (K,) uint8 indices into CHARS
+    """
+    sizes = [-(-len(train) // batch_size) for train, _ in splits]
+    per_pass = sum(sizes)
+    current = None  # (pass, shard, row order) of the shard being read
+    for index in (itertools.count(start) if stop is None else range(start, stop)):
+        epoch, j = divmod(index, per_pass)
+        for k in np.random.default_rng([seed, 2, epoch]).permutation(len(shards)):
+            if j < sizes[k]:
+                break
+            j -= sizes[k]
+        if current is None or current[:2] != (epoch, k):
+            current = (epoch, k, np.random.default_rng([seed, 3, epoch, k]).permutation(splits[k][0]))
+        # Sorted rows: sequential reads from the memmap
+        rows = np.sort(current[2][j * batch_size:(j + 1) * batch_size])
+        X, y = shards[k]
+        yield index, X[rows].astype(np.float32) * np.float32(1.0 / 255.0), np.asarray(y[rows])
+
+def stream_batch(font_paths, cache, seed, index, batch_size=STREAM_BATCH, stream=0):
+    """
+    One augmented mini-batch of random (font, char) glyphs from the cache.
+    A pure function of (seed, stream, index), so a resumed run sees exactly
+    the batches an uninterrupted one would have.
+    Returns:
+        X: (K, 784) float32 in [0, 1] (K <= batch_size: all-black samples dropped)
+        y: (K,) uint8 indices into CHARS
+    """
+    rng = np.random.default_rng([seed, stream, index])
+    fonts = rng.integers(0, len(font_paths), batch_size)
+    codes = rng.integers(0, len(CHARS), batch_size).astype(np.uint8)
+    stack = augment_batch(cache.stack([(font_paths[f], CHARS[c]) for f, c in zip(fonts, codes)]), rng)
+
+    keep, boxes = crop_boxes(stack)
+    X = normalize_crops(stack, keep, boxes, np.empty((len(keep), IMG_SIZE * IMG_SIZE), dtype=np.uint8))
+    return X.astype(np.float32) * np.float32(1.0 / 255.0), codes[keep]
+
+def augmentation_stream(font_paths, cache, seed=0, start=0, stop=None, batch_size=STREAM_BATCH,
+                        stream=0, prefetch=2):
+    """
+    Mini-batches start..stop-1 (endless if stop is None), rendered ahead
+    on `prefetch` threads while the caller trains on the current one.
+    Yields:
+        (index, X, y), see stream_batch
+    """
+    def render(index):
+        X, y = stream_batch(font_paths, cache, seed, index, batch_size, stream)
+        return index, X, y
+
+    # A batch depends only on (seed, stream, index), so rendering ahead (or
+    # again after a resume) never changes what the model is trained on
+    indices = itertools.count(start) if stop is None else range(start, stop)
+    return prefetch_map(render, indices, window=prefetch)
+
+def save_checkpoint(state, path=CHECKPOINT_PATH):
+    """Pickle the training state; the temp file + rename never leaves a torn checkpoint."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+
+def new_model(batch_size=STREAM_BATCH):
+    return MLPClassifier(hidden_layer_sizes=(512, 256), 
+                         activation='relu', 
+                         solver='adam', 
+                         alpha=0.0001, 
+                         batch_size=batch_size, 
+                         random_state=42)
+
+def train_streaming(font_paths=None, seed=0, batches=None, batch_size=STREAM_BATCH,
+                    checkpoint_path=CHECKPOINT_PATH, checkpoint_every=CHECKPOINT_EVERY, resume=True,
+                    shard_dir=None):
+    """
+    Out-of-core training: mini-batches go straight into
+    MLPClassifier.partial_fit, so memory does not grow with the number of
+    fonts or samples. Batches are augmented on the fly from a GlyphCache of
+    `font_paths`, or, with `shard_dir`, read from a dataset exported by
+    generate_data (a small seeded share of each shard is held out).
+    Every `checkpoint_every` batches the model is scored on a fixed held-out
+    set and the whole state (model with its optimizer, next batch, best
+    score) is checkpointed. A run with the same data source/seed/batch size
+    resumes from the checkpoint. Training stops after `batches` batches or
+    PATIENCE checkpoints without improvement.
+    Returns:
+        model: fitted MLPClassifier (labels are indices into CHARS)
+        score: last held-out accuracy
+    """
+    classes = np.arange(len(CHARS))
+    if shard_dir is not None:
+        manifest, shards = open_shards(shard_dir)
+        splits = split_shards(shards, seed)
+        if batches is None:
+            batches = sum(-(-len(train) // batch_size) for train, _ in splits) * STREAM_EPOCHS
+        config = {"shards": os.path.abspath(shard_dir), "export_seed": manifest["seed"],
+                  "counts": [s["count"] for s in manifest["shards"]], "seed": seed, "batch_size": batch_size}
+        X_val, y_val = shard_held_out(shards, splits)
+        stream = lambda start: shard_batches(shards, splits, seed, start=start, stop=batches,
+                                             batch_size=batch_size)
+    else:
+        if batches is None:
+            batches = len(font_paths) * len(CHARS) * SAMPLES_PER_CHAR * STREAM_EPOCHS // batch_size
+        config = {"fonts": list(font_paths), "seed": seed, "batch_size": batch_size}
+        cache = GlyphCache()
+        # Fixed held-out set from its own seed stream (never trained on)
+        held_out = [stream_batch(font_paths, cache, seed, i, batch_size, stream=1)
+                    for i in range(VALIDATION_BATCHES)]
+        X_val = np.concatenate([X for X, _ in held_out])
+        y_val = np.concatenate([y for _, y in held_out])
+        del held_out
+        stream = lambda start: augmentation_stream(font_paths, cache, seed, start=start, stop=batches,
+                                                   batch_size=batch_size)
+
+    state = load_checkpoint(checkpoint_path) if resume else None
+    if state is not None and state["config"] != config:
+        print("Checkpoint was made with other data/seed/batch size; starting over.")
+        state = None
+    if state is None:
+        state = {"config": config, "model": new_model(batch_size), "next_batch": 0,
+                 "best_score": -1.0, "no_improve": 0, "score": 0.0}
+    else:
+        print(f"Resuming from batch {state['next_batch']} (held-out accuracy {state['score'] * 100:.2f}%)")
+    model = state["model"]
+
+    print(f"Training MLPClassifier (Neural Network) on {batches} batches of {batch_size}...")
+    for index, X, y in stream(state["next_batch"]):
+        # One Adam step per mini-batch (all-black samples make some batches short)
+        model.batch_size = len(X)
+        model.partial_fit(X, y, classes=classes)
+        state["next_batch"] = index + 1
+        if state["next_batch"] % checkpoint_every and state["next_batch"] != batches:
+            continue
+
+        state["score"] = model.score(X_val, y_val)
+        if state["score"] > state["best_score"]:
+            state["best_score"], state["no_improve"] = state["score"], 0
+        else:
+            state["no_improve"] += 1
+        save_checkpoint(state, checkpoint_path)
+        print(f"Batch {state['next_batch']}/{batches}: loss {model.loss_:.4f}, "
+              f"held-out accuracy {state['score'] * 100:.2f}%")
+        if state["no_improve"] >= PATIENCE:
+            print(f"No improvement for {PATIENCE} checkpoints, stopping.")
+            break
+
+    return model, state["score"]
+
+def train(seed=0, batches=None, resume=True, shard_dir=None):
     os.makedirs(DATA_DIR, exist_ok=True)
     abs_model_path = os.path.abspath(MODEL_PATH)
     print(f"Target Model Path: {abs_model_path}")
     
-    X, y = generate_data()
-    
-    # Cast X to float32 to save memory and ensure type safety
-    X = X.astype(np.float32)
-    
-    print(f"Total dataset size: {len(X)}")
-    
-    # Encode labels to integers
-    le = LabelEncoder()
-    y_encoded = le.fit_transform(y)
-    
-    X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.1, random_state=42)
-    
-    print("Training MLPClassifier (Neural Network)...")
-    model = MLPClassifier(hidden_layer_sizes=(512, 256), 
-                          activation='relu', 
-                          solver='adam', 
-                          alpha=0.0001, 
-                          batch_size=256, 
-                          learning_rate='adaptive', 
-                          max_iter=500, 
-                          early_stopping=True, 
-                          verbose=True, 
-                          # warm_start=True, # Could help if we looped, but for now just fit
-                          random_state=42)
-                          
-    model.fit(X_train, y_train)
-    
-    acc = model.score(X_test, y_test)
+    if shard_dir is not None:
+        print(f"Training on the exported shards in {shard_dir}...")
+        model, acc = train_streaming(seed=seed, batches=batches, resume=resume, shard_dir=shard_dir)
+    else:
+        print("Finding system fonts...")
+        font_paths = get_system_fonts()
+        print(f"Found {len(font_paths)} fonts.")
+        selected_fonts = select_fonts(font_paths, seed)
+        print(f"Training on {len(selected_fonts)} fonts...")
+        model, acc = train_streaming(selected_fonts, seed=seed, batches=batches, resume=resume)
     print(f"Neural Network Accuracy: {acc * 100:.2f}%")
     
     try:
@@ -189,11 +536,14 @@ def train():
             os.remove(abs_model_path) # Force remove old
             
         # Attach the class mapping to the model so recognize.py can decode
-        model.custom_classes_ = le.classes_
+        model.custom_classes_ = np.array(list(CHARS))
         
         with open(abs_model_path, 'wb') as f:
             pickle.dump(model, f)
         print("Model saved successfully.")
+        # Finished: the next run starts a fresh training
+        if os.path.exists(CHECKPOINT_PATH):
+            os.remove(CHECKPOINT_PATH)
     except Exception as e:
         print(f"FAILED TO SAVE MODEL: {e}")
     
@@ -204,4 +554,19 @@ def train():
         print("CRITICAL: File does not exist after save!")
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the char model on streamed synthetic glyphs.")
+    parser.add_argument("--seed", type=int, default=0, help="seed for font selection and augmentation")
+    parser.add_argument("--batches", type=int, default=None,
+                        help=f"mini-batches to train on (default: {STREAM_EPOCHS} passes' worth)")
+    parser.add_argument("--restart", action="store_true", help=f"ignore an existing {CHECKPOINT_PATH}")
+    parser.add_argument("--export-shards", action="store_true",
+                        help=f"only write the fixed dataset as .npy shards to {SHARD_DIR}")
+    parser.add_argument("--workers", type=int, default=None, help="shard export processes (default: all cores)")
+    parser.add_argument("--from-shards", action="store_true",
+                        help=f"train on the dataset exported to {SHARD_DIR} instead of fresh augmentations")
+    args = parser.parse_args()
+    if args.export_shards:
+        generate_data(SHARD_DIR, workers=args.workers, seed=args.seed)
+    else:
+        train(seed=args.seed, batches=args.batches, resume=not args.restart,
+              shard_dir=SHARD_DIR if args.from_shards else None)